@@ -0,0 +1,200 @@
+import asyncio
+import random
+import time
+from logging import Logger, getLogger
+
+from concurrency.functions import time_async
+from concurrency.thread.file_manager import FileManager, download_data
+from concurrency.thread.saved_file_index import SavedFileIndex
+
+# Number of concurrent simulated transfers in each benchmark round
+BENCHMARK_SIZES = [100, 1_000, 10_000]
+# The number of seconds every simulated transfer takes in the benchmark
+BENCHMARK_EST = 0.5
+
+
+class AsyncFileManager:
+    """
+    The asyncio counterpart of FileManager.
+
+    It has the same semantics as FileManager, but the operations are coroutines,
+    so a single event loop can drive a lot more concurrent operations than the
+    number of OS threads a system can handle. The max_file_process limit is kept
+    by a semaphore and every file has its own asyncio lock.
+    """
+
+    # Maximum number of concurrent file tasks
+    max_file_process: int
+    # A sharded index to keep track of saved files
+    saved_files: SavedFileIndex
+    # A semaphore allowing only max_file_process number of operations at the same time
+    semaphore: asyncio.Semaphore
+    # Dictionary to maintain individual locks for each file
+    file_locks: dict[str, asyncio.Lock]
+    # Logger object
+    logger: Logger
+
+    def __init__(self, max_file_process: int, logger: Logger) -> None:
+        """
+        Initialize the AsyncFileManager with max_file_process.
+
+        Args:
+            max_file_process (int): Maximum number of parralel file tasks.
+            logger (Logger): The main logger object
+        """
+        self.max_file_process = max_file_process
+        self.logger = logger
+        self.saved_files = SavedFileIndex()
+        self.semaphore = asyncio.Semaphore(max_file_process)
+        self.file_locks = {}
+
+    def get_file_lock(self, file_path: str) -> asyncio.Lock:
+        """
+        Returns the lock of a specified file, creating it first if it doesn't exist.
+
+        There is no need for an extra lock here, as the event loop runs only one
+        coroutine at a time.
+        """
+        if file_path not in self.file_locks:
+            self.file_locks[file_path] = asyncio.Lock()
+        return self.file_locks[file_path]
+
+    def guard_process(func):
+        """
+        Decorator function to manage the maximum number of parallel tasks.
+
+        This function ensures that only max_file_process number of coroutines can
+        run an operation at the same time.
+        """
+
+        async def wrapper(self, file_path: str, est: int):
+            if self.semaphore.locked():
+                self.logger.info(
+                    f"Already running {self.max_file_process} operations, {file_path} is waiting for a free worker..."
+                )
+            async with self.semaphore:
+                return await func(self, file_path, est)
+
+        return wrapper
+
+    @guard_process
+    async def download_file(self, file_path: str, est: int) -> None:
+        """
+        Simulate file downloading, see FileManager.download_file.
+
+        Args:
+            file_path (str): Path of the file to be downloaded
+            est (int): The number of seconds the simulated download will take
+        """
+        self.logger.info(f"Downloading {file_path}...")
+
+        await asyncio.sleep(est)
+        async with self.get_file_lock(file_path):
+            self.logger.info(f"Saving downloaded file {file_path}...")
+            self.saved_files.add(file_path)
+        self.logger.info(f"Downloaded {file_path} in {est} seconds.")
+
+    @guard_process
+    async def check_saved_file(self, file_path: str, est: int) -> None:
+        """
+        Simulate file checking, see FileManager.check_saved_file.
+
+        Args:
+            file_path (str): Path of the file to be checked
+            est (int): The number of seconds the simulated check will take
+        """
+        self.logger.info(f"Checking {file_path}...")
+
+        async with self.get_file_lock(file_path):
+            if file_path not in self.saved_files:
+                self.logger.error(f"File {file_path} not found.")
+                return
+            await asyncio.sleep(est)
+        self.logger.info(f"Checked {file_path} in {est} seconds.")
+
+    @guard_process
+    async def write_file(self, file_path: str, est: int) -> None:
+        """
+        Simulate writing / editing the file, see FileManager.write_file.
+
+        Args:
+            file_path (str): Path of the file to be written
+            est (int): The number of seconds the simulated write will take
+        """
+        self.logger.info(f"Checking if {file_path} exists...")
+
+        async with self.get_file_lock(file_path):
+            await asyncio.sleep(est)
+            _, created = self.saved_files.upsert(file_path)
+            if created:
+                self.logger.info(f"File {file_path} not found in saved files, created it.")
+        self.logger.info(f"Wrote {file_path} in {est} seconds.")
+
+
+async def run_async_transfers(num_of_transfers: int, logger: Logger) -> float:
+    """Download num_of_transfers distinct files at once with an AsyncFileManager."""
+    file_manager = AsyncFileManager(num_of_transfers, logger)
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            file_manager.download_file(f"file/{i}", BENCHMARK_EST)
+            for i in range(num_of_transfers)
+        )
+    )
+    return time.perf_counter() - start
+
+
+def run_threaded_transfers(num_of_transfers: int, logger: Logger) -> float:
+    """Download num_of_transfers distinct files at once with a threaded FileManager."""
+    start = time.perf_counter()
+    with FileManager(num_of_transfers, logger) as file_manager:
+        futures = [
+            file_manager.submit(file_manager.download_file, f"file/{i}", BENCHMARK_EST)
+            for i in range(num_of_transfers)
+        ]
+        for future in futures:
+            future.result()
+    return time.perf_counter() - start
+
+
+@time_async
+async def main() -> None:
+    """
+    The main entrypoint of the async file manager.
+
+    It runs a few random operations on an AsyncFileManager, then benchmarks it
+    against the threaded FileManager, with as many concurrent simulated transfers
+    as given in BENCHMARK_SIZES.
+    """
+    logger = getLogger("Async file manager")
+    file_manager = AsyncFileManager(3, logger)
+    file_operations = [
+        file_manager.download_file,
+        file_manager.check_saved_file,
+        file_manager.write_file,
+    ]
+    await asyncio.gather(
+        *(
+            random.choice(file_operations)(*random.choice(download_data))
+            for _ in range(10)
+        )
+    )
+
+    benchmark_logger = getLogger("File manager benchmark")
+    benchmark_logger.setLevel("WARNING")
+    print(f"{'transfers':>10} {'asyncio (s)':>12} {'threads (s)':>12}")
+    for num_of_transfers in BENCHMARK_SIZES:
+        async_time = await run_async_transfers(num_of_transfers, benchmark_logger)
+        try:
+            threaded_time = f"{run_threaded_transfers(num_of_transfers, benchmark_logger):12.2f}"
+        except RuntimeError as exc:
+            # Raised when the system can't start any more OS threads
+            threaded_time = f"{'failed':>12}"
+            logger.error(f"Threaded run with {num_of_transfers} transfers failed: {exc}")
+        print(f"{num_of_transfers:>10} {async_time:12.2f} {threaded_time}")
+
+    print("Main finished ", end="")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
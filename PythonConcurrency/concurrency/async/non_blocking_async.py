@@ -1,6 +1,7 @@
 import asyncio
 
 from concurrency.functions import (
+    NUM_OF_TASKS,
     io_bound_async,
     cpu_bound_async,
     time_async,
@@ -10,11 +11,12 @@ from concurrency.functions import (
 @time_async
 async def main():
     """A good implementation of the main function,
-    where the async tasks don't wait for each other."""
+    where the async tasks don't wait for each other.
+    The NUM_OF_TASKS CPU bound tasks run in parallel in the shared process pool."""
 
     tasks = [
         asyncio.create_task(io_bound_async()),
-        asyncio.create_task(cpu_bound_async()),
+        *(asyncio.create_task(cpu_bound_async()) for _ in range(NUM_OF_TASKS)),
         asyncio.create_task(io_bound_async()),
     ]
 
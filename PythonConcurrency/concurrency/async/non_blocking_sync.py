@@ -1,7 +1,8 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 
+from concurrency.executors import run_cpu, run_io
 from concurrency.functions import (
+    NUM_OF_TASKS,
     io_bound_async,
     cpu_bound,
     io_bound,
@@ -12,18 +13,16 @@ from concurrency.functions import (
 @time_async
 async def main():
     """A proper implementation of the main function,
-    where the blocking synchronous tasks are run in an executor."""
+    where the blocking synchronous tasks are run in an executor.
+    The shared executors are used, processes for the CPU bound task, and
+    threads for the blocking I/O."""
 
     bg_task = asyncio.create_task(io_bound_async())
-    sync_tasks = []
+    sync_tasks = [run_cpu(cpu_bound)]
+    for _ in range(NUM_OF_TASKS):
+        sync_tasks.append(run_io(io_bound))
 
-    loop = asyncio.get_running_loop()
-    with ThreadPoolExecutor(max_workers=10) as pool:
-        sync_tasks.append(loop.run_in_executor(pool, cpu_bound))
-        for _ in range(3):
-            sync_tasks.append(loop.run_in_executor(pool, io_bound))
-
-        await asyncio.gather(*sync_tasks)
+    await asyncio.gather(*sync_tasks)
 
     print("Executor tasks finished.")
     await bg_task
@@ -0,0 +1,198 @@
+import argparse
+import fnmatch
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from concurrency.multiprocess.results_store import environment_metadata, summarize
+from concurrency.settings import ENV_PREFIX
+
+# Directory of the concurrency package
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# The demo scenarios, by module, with the parameter giving the number of units of
+# work they run, e.g. TASKS, or None if they run a fixed amount of work.
+# The tools and the long benchmarks, e.g. fan_out or process_tester, aren't scenarios.
+SCENARIOS: dict[str, str | None] = {
+    "thread.single_thread": "TASKS",
+    "thread.multithread": "TASKS",
+    "thread.other_single_thread": "TASKS",
+    "thread.other_multithread": "TASKS",
+    "thread.file_manager": None,
+    "thread.storage": None,
+    "async.sync_blocking": None,
+    "async.async_blocking": None,
+    "async.non_blocking_sync": "TASKS",
+    "async.non_blocking_async": "TASKS",
+    "multiprocess.slow_pizza": "PIZZAS",
+    "multiprocess.fast_pizza": "PIZZAS",
+}
+# The last "in X seconds." line time_sync prints, i.e. the one of main
+REPORTED_TIME = re.compile(r"in (\d+(?:\.\d+)?) seconds\.")
+
+
+def discover(patterns: list[str] = None, exclude: list[str] = ()) -> list[str]:
+    """
+    Returns the SCENARIOS, e.g. "thread.multithread", matching any of the patterns.
+
+    Args:
+        patterns (list): fnmatch patterns of the scenarios to run, every one if None.
+        exclude (list): fnmatch patterns of the scenarios to skip.
+    """
+    return [
+        name
+        for name in SCENARIOS
+        if (not patterns or any(fnmatch.fnmatch(name, p) for p in patterns))
+        and not any(fnmatch.fnmatch(name, p) for p in exclude)
+    ]
+
+
+def parse_params(assignments: list[str]) -> list[dict[str, str]]:
+    """
+    Returns every combination of the parameter values.
+
+    Args:
+        assignments (list): NAME=VALUE[,VALUE...] strings, see settings.env_param.
+    """
+    names, values = [], []
+    for assignment in assignments:
+        name, _, value = assignment.partition("=")
+        names.append(name.upper())
+        values.append(value.split(","))
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def run_once(scenario: str, params: dict[str, str], timeout: float) -> tuple[float, float]:
+    """
+    Run a scenario in a new interpreter.
+
+    Returns:
+        tuple[float, float]: The wall time of the process, and the time its main
+        function reported, NaN if it reported none.
+    """
+    env = {**os.environ, **{ENV_PREFIX + name: value for name, value in params.items()}}
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-m", f"concurrency.{scenario}"],
+        cwd=os.path.dirname(PACKAGE_DIR),
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+    )
+    elapsed = time.perf_counter() - start
+    if completed.returncode:
+        raise RuntimeError(
+            f"{scenario} exited with {completed.returncode}:\n{completed.stderr[-2000:]}"
+        )
+    reported = REPORTED_TIME.findall(completed.stdout)
+    return elapsed, float(reported[-1]) if reported else float("nan")
+
+
+def benchmark(
+    scenario: str, params: dict[str, str], runs: int, warmup: int, timeout: float
+) -> dict:
+    """
+    Run a scenario warmup + runs times, returning the summary of the measured runs.
+
+    If a run fails or times out, the rest are skipped, and only the error is returned.
+    The throughput is the number of units of work per second, see SCENARIOS, None if
+    the scenario runs a fixed amount of work, or the number of units isn't set.
+    """
+    result = {"scenario": scenario, "params": params}
+    try:
+        for _ in range(warmup):
+            run_once(scenario, params, timeout)
+        samples = [run_once(scenario, params, timeout) for _ in range(runs)]
+    except (RuntimeError, subprocess.TimeoutExpired) as exc:
+        return {**result, "error": str(exc)}
+    wall = [elapsed for elapsed, _ in samples]
+    summary = summarize(wall)
+    unit = SCENARIOS[scenario]
+    return {
+        **result,
+        "samples": wall,
+        "reported": [reported for _, reported in samples],
+        **summary,
+        "throughput": int(params[unit]) / summary["mean"] if unit in params else None,
+    }
+
+
+def main() -> None:
+    """
+    Run the demo scenarios in isolated subprocesses, and compare their performance.
+
+    Every scenario is run with every combination of the --set parameters, e.g.
+    --set TASKS=1,10 --set IO_SECONDS=0.5, which override the CONCURRENCY_<NAME>
+    environment variables of the demos. The throughput is the units of work per
+    second, e.g. TASKS / mean wall time, only for the scenarios whose units are set.
+    A failing scenario is reported, and the rest are still run, the exit status is 1.
+    """
+    parser = argparse.ArgumentParser(
+        description=main.__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("scenarios", nargs="*", help="fnmatch patterns, e.g. 'thread.*'")
+    parser.add_argument("--exclude", action="append", default=[])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUES")
+    parser.add_argument("--list", action="store_true", help="List the scenarios and exit.")
+    parser.add_argument("--output", help="Save the results and the host metadata as JSON.")
+    args = parser.parse_args()
+
+    scenarios = discover(args.scenarios, args.exclude)
+    if args.list:
+        print("\n".join(scenarios))
+        return
+
+    results = []
+    for scenario in scenarios:
+        for params in parse_params(args.set):
+            print(f"Running {scenario} {params}...", file=sys.stderr)
+            results.append(
+                benchmark(scenario, params, args.runs, args.warmup, args.timeout)
+            )
+
+    params = [" ".join(f"{k}={v}" for k, v in r["params"].items()) for r in results]
+    width = max(map(len, ["params", *params]))
+    print(
+        f"{'scenario':<28} {'params':<{width}} {'mean (s)':>9} {'stddev':>8} {'p50':>8} "
+        f"{'p90':>8} {'main (s)':>9} {'throughput':>11}"
+    )
+    for r, r_params in zip(results, params):
+        if "error" in r:
+            print(f"{r['scenario']:<28} {r_params:<{width}} FAILED")
+            continue
+        reported = summarize(r["reported"])["mean"]
+        throughput = (
+            f"{r['throughput']:9.2f}/s" if r["throughput"] is not None else f"{'-':>11}"
+        )
+        print(
+            f"{r['scenario']:<28} {r_params:<{width}} {r['mean']:9.3f} {r['stddev']:8.3f} "
+            f"{r['p50']:8.3f} {r['p90']:8.3f} {reported:9.3f} {throughput}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "metadata": environment_metadata(runs=args.runs, warmup=args.warmup),
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+        print(f"Results saved to {args.output}")
+
+    if failed := [r for r in results if "error" in r]:
+        for r in failed:
+            print(f"{r['scenario']} {r['params']} failed: {r['error']}", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
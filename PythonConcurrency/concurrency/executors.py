@@ -0,0 +1,76 @@
+import asyncio
+import atexit
+import concurrent.futures
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+# Kind of the executor running the CPU-bound work, "process" or "interpreter".
+# The interpreter pool runs every worker in its own subinterpreter with its own GIL,
+# it falls back to the process pool on Python versions without one.
+CPU_EXECUTOR_ENV_VAR = "CONCURRENCY_CPU_EXECUTOR"
+# Number of threads running the blocking I/O work
+IO_WORKERS = 32
+
+# The shared executors, created on their first use
+executors: dict[str, Executor] = {}
+# A lock for creating every executor only once
+executors_lock = threading.Lock()
+
+
+def create_cpu_executor() -> Executor:
+    """Returns a new executor with a worker for every CPU core, see CPU_EXECUTOR_ENV_VAR."""
+    interpreter_pool = getattr(concurrent.futures, "InterpreterPoolExecutor", None)
+    if os.environ.get(CPU_EXECUTOR_ENV_VAR) == "interpreter" and interpreter_pool:
+        return interpreter_pool()
+    return ProcessPoolExecutor()
+
+
+def get_executor(kind: str) -> Executor:
+    """
+    Returns the shared executor of a kind of work, creating it on the first call.
+
+    Args:
+        kind (str): "cpu" for CPU-bound work, run in parallel on every core,
+            "io" for blocking I/O, run on threads.
+    """
+    if executor := executors.get(kind):
+        return executor
+    with executors_lock:
+        if kind not in executors:
+            if kind == "cpu":
+                executors[kind] = create_cpu_executor()
+            elif kind == "io":
+                executors[kind] = ThreadPoolExecutor(
+                    max_workers=IO_WORKERS, thread_name_prefix="io"
+                )
+            else:
+                raise ValueError(f"Unknown kind of work {kind}, use cpu or io.")
+        return executors[kind]
+
+
+async def run_cpu(func: callable, *args, **kwargs):
+    """
+    Await func(*args, **kwargs) run on the shared CPU executor.
+
+    The function and its arguments are sent to another process, so they have to be
+    picklable, i.e. defined at module level.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor("cpu"), partial(func, *args, **kwargs))
+
+
+async def run_io(func: callable, *args, **kwargs):
+    """Await func(*args, **kwargs) run on the shared I/O thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor("io"), partial(func, *args, **kwargs))
+
+
+@atexit.register
+def shutdown_executors() -> None:
+    """Shut down every shared executor, they are created again when used."""
+    with executors_lock:
+        for executor in executors.values():
+            executor.shutdown()
+        executors.clear()
@@ -1,29 +1,25 @@
 import time
 import asyncio
-from functools import wraps
-from concurrent.futures import ThreadPoolExecutor
 
-N_TH_FIBO = 36
+from concurrency.executors import run_cpu
+from concurrency.instrumentation import instrument
+from concurrency.kernels import N_TH_FIBO, get_kernel
+from concurrency.settings import env_param
 
+# Number of tasks the demos run
+NUM_OF_TASKS = env_param("TASKS", 3)
+# Number of seconds a simulated I/O operation takes
+IO_SECONDS = env_param("IO_SECONDS", 5, float)
 
-def time_sync(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start = time.perf_counter()
-        func(*args, **kwargs)
-        print(f"in {time.perf_counter()-start:.2f} seconds.")
 
-    return wrapper
+def time_sync(func):
+    """Prints the wall time of every call, and records it, see instrumentation.instrument."""
+    return instrument(func)
 
 
 def time_async(func):
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        start = time.perf_counter()
-        await func(*args, **kwargs)
-        print(f"in {time.perf_counter()-start:.2f} seconds.")
-
-    return wrapper
+    """Prints the wall time of every awaited call, and records it, see instrumentation.instrument."""
+    return instrument(func)
 
 
 @time_sync
@@ -32,7 +28,7 @@ def io_bound(task_description: str = None):
     print(
         f"Starting {task_description if task_description else 'I/O bound'} operation."
     )
-    time.sleep(5)
+    time.sleep(IO_SECONDS)
     print(
         f"{task_description if task_description else 'I/O bound'} operation finished ",
         end="",
@@ -40,19 +36,14 @@ def io_bound(task_description: str = None):
 
 
 @time_sync
-def cpu_bound(task_description: str = None, fibo_value: int = None):
-    """Simulates a blocking CPU operation."""
+def cpu_bound(task_description: str = None, fibo_value: int = None, kernel: str = None):
+    """Simulates a blocking CPU operation.
+
+    The Fibonacci kernel is picked by name, see kernels.get_kernel."""
     print(
         f"Starting {task_description if task_description else 'CPU bound'} operation."
     )
-
-    def fibonacci(n):
-        if n <= 1:
-            return n
-        else:
-            return fibonacci(n - 1) + fibonacci(n - 2)
-
-    fibonacci(fibo_value if fibo_value else N_TH_FIBO)
+    get_kernel(kernel).fibonacci(fibo_value if fibo_value else N_TH_FIBO)
     print(
         f"{task_description if task_description else 'CPU bound'} operation finished ",
         end="",
@@ -73,23 +64,18 @@ async def io_bound_async():
     print("Starting I/O bound async task.")
     for i in range(5):
         print(f"I/O bound async task iteration {i}.")
-        await asyncio.sleep(1)
+        await asyncio.sleep(IO_SECONDS / 5)
     print(f"I/O bound async task finished ", end="")
 
 
 @time_async
-async def cpu_bound_async():
-    """A random async task that runs on the CPU, it doesn't make much sense.
-    Leaving it here for 'completeness'."""
-
-    def fibonacci(n):
-        if n <= 1:
-            return n
-        else:
-            return fibonacci(n - 1) + fibonacci(n - 2)
+async def cpu_bound_async(kernel: str = None):
+    """A random async task that runs on the CPU.
 
+    The work is offloaded to the shared CPU executor, a pool of processes, so it
+    neither blocks the event loop nor competes with it for the GIL, and several of
+    these tasks run in parallel on different cores.
+    The Fibonacci kernel is picked by name, see kernels.get_kernel."""
     print("Starting CPU bound async task.")
-    loop = asyncio.get_running_loop()
-    with ThreadPoolExecutor() as pool:
-        await loop.run_in_executor(pool, fibonacci, N_TH_FIBO)
+    await run_cpu(get_kernel(kernel).fibonacci, N_TH_FIBO)
     print(f"CPU bound async task finished ", end="")
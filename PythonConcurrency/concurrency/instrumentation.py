@@ -0,0 +1,323 @@
+import atexit
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, the context switches and peak RSS are skipped
+    resource = None
+
+# Setting it to anything but "" or "0" enables the instrumentation at startup
+ENABLE_ENV_VAR = "CONCURRENCY_INSTRUMENTATION"
+# If set, the measurements are exported into this file at exit, as Prometheus text if
+# it ends with .prom, as JSON otherwise
+EXPORT_ENV_VAR = "CONCURRENCY_METRICS_FILE"
+# The percentiles reported of every metric
+PERCENTILES = (50, 95, 99)
+# Maximum number of values a histogram keeps for computing the percentiles
+RESERVOIR_SIZE = 1024
+# Description of every recorded metric, by name
+METRICS = {
+    "wall_seconds": "Wall-clock time of the call.",
+    "cpu_seconds": "CPU time of the whole process during the call.",
+    "thread_cpu_seconds": "CPU time of the calling thread during the call.",
+    "context_switches": "Voluntary and involuntary context switches of the process during the call.",
+    "peak_rss_bytes": "Peak resident set size of the process after the call.",
+}
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """The p-th percentile of the sorted values, by linear interpolation."""
+    position = (len(sorted_values) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (
+        position - lower
+    )
+
+
+class Histogram:
+    """
+    The observed values of a metric, summarized by their percentiles.
+
+    It keeps a uniform random sample of at most reservoir_size values (reservoir
+    sampling), so its memory stays bounded however many values are observed. The
+    count, sum and extremes are exact, the percentiles are estimated from the sample.
+    """
+
+    # Maximum number of values kept
+    reservoir_size: int
+    # The uniform random sample of the observed values
+    values: list[float]
+    # Number of observed values
+    count: int
+    # Sum of the observed values
+    total: float
+    # Extremes of the observed values
+    min: float
+    max: float
+    # A lock for synchronizing access to the values
+    lock: threading.Lock
+
+    def __init__(self, reservoir_size: int = RESERVOIR_SIZE) -> None:
+        self.reservoir_size = reservoir_size
+        self.values = []
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self.lock:
+            self.count += 1
+            self.total += value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+            if len(self.values) < self.reservoir_size:
+                self.values.append(value)
+            elif (index := random.randrange(self.count)) < self.reservoir_size:
+                # Every value observed so far stays in the sample with equal probability
+                self.values[index] = value
+
+    def summary(self) -> dict[str, float]:
+        """Returns the count, sum, extremes and PERCENTILES of the values."""
+        with self.lock:
+            values = sorted(self.values)
+            count, total, low, high = self.count, self.total, self.min, self.max
+        if not values:
+            return {"count": 0, "sum": 0.0}
+        return {
+            "count": count,
+            "sum": total,
+            "min": low,
+            "max": high,
+            **{f"p{p}": percentile(values, p) for p in PERCENTILES},
+        }
+
+
+class Registry:
+    """
+    The histograms of every metric of every instrumented function.
+
+    While it is disabled, the instrumented functions only measure their wall time.
+    """
+
+    # Whether the instrumented functions record their measurements
+    enabled: bool
+    # The histogram of every (function name, metric name) pair
+    histograms: dict[tuple[str, str], Histogram]
+    # Number of calls that raised an exception, by function name
+    errors: dict[str, int]
+    # A lock for synchronizing access to the dictionaries
+    lock: threading.Lock
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.histograms = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, measurement: dict[str, float], failed: bool) -> None:
+        """Record the measurement of a call of the function name."""
+        with self.lock:
+            histograms = [
+                self.histograms.setdefault((name, metric), Histogram())
+                for metric in measurement
+            ]
+            self.errors[name] = self.errors.get(name, 0) + failed
+        for histogram, value in zip(histograms, measurement.values()):
+            histogram.observe(value)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.histograms.clear()
+            self.errors.clear()
+
+    def snapshot(self) -> dict[str, dict]:
+        """Returns the summary of every metric and the number of errors, by function name."""
+        with self.lock:
+            histograms = dict(self.histograms)
+            errors = dict(self.errors)
+        snapshot = {name: {"errors": count} for name, count in errors.items()}
+        for (name, metric), histogram in histograms.items():
+            snapshot[name][metric] = histogram.summary()
+        return snapshot
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = "concurrency") -> str:
+        """Returns the metrics in the Prometheus text format, as summaries."""
+        snapshot = self.snapshot()
+        lines = []
+        for metric, description in METRICS.items():
+            series = [(name, s[metric]) for name, s in snapshot.items() if metric in s]
+            if not series:
+                continue
+            lines.append(f"# HELP {prefix}_{metric} {description}")
+            lines.append(f"# TYPE {prefix}_{metric} summary")
+            for name, summary in series:
+                for p in PERCENTILES:
+                    lines.append(
+                        f'{prefix}_{metric}{{function="{name}",quantile="{p / 100}"}} '
+                        f"{summary[f'p{p}']}"
+                    )
+                lines.append(f'{prefix}_{metric}_sum{{function="{name}"}} {summary["sum"]}')
+                lines.append(
+                    f'{prefix}_{metric}_count{{function="{name}"}} {summary["count"]}'
+                )
+        lines.append(f"# HELP {prefix}_errors_total Calls that raised an exception.")
+        lines.append(f"# TYPE {prefix}_errors_total counter")
+        for name, s in snapshot.items():
+            lines.append(f'{prefix}_errors_total{{function="{name}"}} {s["errors"]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> None:
+        """Write the metrics into a file, as Prometheus text if it ends with .prom, as JSON otherwise."""
+        with open(path, "w") as file:
+            file.write(self.to_prometheus() if path.endswith(".prom") else self.to_json())
+
+
+# The registry the instrumented functions record into by default
+REGISTRY = Registry(enabled=os.environ.get(ENABLE_ENV_VAR, "") not in ("", "0"))
+if os.environ.get(EXPORT_ENV_VAR):
+    atexit.register(REGISTRY.export, os.environ[EXPORT_ENV_VAR])
+
+
+def enable(registry: Registry = REGISTRY) -> None:
+    registry.enabled = True
+
+
+def disable(registry: Registry = REGISTRY) -> None:
+    registry.enabled = False
+
+
+def rusage() -> tuple[int, int]:
+    """Returns the number of context switches and the peak RSS in bytes of the process."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    peak_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return usage.ru_nvcsw + usage.ru_nivcsw, peak_rss
+
+
+class Probe:
+    """Measures every metric of a single call."""
+
+    # The registry the measurement is recorded into
+    registry: Registry
+    # The clocks and counters at the start of the call
+    start: float
+    cpu_start: float
+    thread_cpu_start: float
+    switches_start: int
+
+    def __init__(self, registry: Registry) -> None:
+        self.registry = registry
+        self.cpu_start = time.process_time()
+        self.thread_cpu_start = time.thread_time()
+        if resource:
+            self.switches_start = rusage()[0]
+        self.start = time.perf_counter()
+
+    def stop(self, name: str, failed: bool) -> float:
+        """Record the measurement of the call, returning its wall time."""
+        wall = time.perf_counter() - self.start
+        measurement = {
+            "wall_seconds": wall,
+            "cpu_seconds": time.process_time() - self.cpu_start,
+            "thread_cpu_seconds": time.thread_time() - self.thread_cpu_start,
+        }
+        if resource:
+            switches, peak_rss = rusage()
+            measurement["context_switches"] = switches - self.switches_start
+            measurement["peak_rss_bytes"] = peak_rss
+        self.registry.observe(name, measurement, failed)
+        return wall
+
+
+def module_name(func: callable) -> str:
+    """The module of a function, the real name of the module run as a script too."""
+    module = func.__module__
+    if module == "__main__":
+        spec = getattr(sys.modules["__main__"], "__spec__", None)
+        module = spec.name if spec else module
+    return module
+
+
+def instrument(
+    func: callable = None,
+    *,
+    name: str = None,
+    registry: Registry = REGISTRY,
+    report: bool = True,
+):
+    """
+    Decorator measuring every call of a function or coroutine function.
+
+    The return value and the exceptions of the function pass through unchanged.
+    While the registry is disabled, only the wall time is measured, if it is reported.
+    For coroutines the CPU time and the context switches include whatever else the
+    event loop ran while the coroutine was awaiting.
+
+    Args:
+        func (callable): The function to instrument.
+        name (str): Name of the function in the registry, by default its qualified
+            name prefixed by its module, e.g. "concurrency.thread.multithread.main".
+        registry (Registry): The registry the measurements are recorded into.
+        report (bool): Whether to print the wall time after every successful call.
+    """
+    if func is None:
+        return lambda f: instrument(f, name=name, registry=registry, report=report)
+    name = name or f"{module_name(func)}.{func.__qualname__}"
+
+    def finish(probe: Probe, failed: bool) -> None:
+        wall = probe.stop(name, failed)
+        if report and not failed:
+            print(f"in {wall:.2f} seconds.")
+
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if not registry.enabled:
+                start = time.perf_counter()
+                result = await func(*args, **kwargs)
+                if report:
+                    print(f"in {time.perf_counter() - start:.2f} seconds.")
+                return result
+            probe = Probe(registry)
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException:
+                finish(probe, failed=True)
+                raise
+            finish(probe, failed=False)
+            return result
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not registry.enabled:
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            if report:
+                print(f"in {time.perf_counter() - start:.2f} seconds.")
+            return result
+        probe = Probe(registry)
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            finish(probe, failed=True)
+            raise
+        finish(probe, failed=False)
+        return result
+
+    return wrapper
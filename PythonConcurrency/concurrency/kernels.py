@@ -0,0 +1,184 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+
+from concurrency.settings import env_param
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the numpy kernel is only registered if it is installed
+    np = None
+
+N_TH_FIBO = env_param("FIBO_N", 36)
+# Selects the kernel of the demos, see KERNELS
+KERNEL_ENV_VAR = "CONCURRENCY_KERNEL"
+# The kernel of the demos if none is selected, the exponential one keeps them CPU bound
+DEFAULT_KERNEL = "naive"
+# Maximum number of results the memoized kernel keeps
+MEMO_CACHE_SIZE = 256
+# The largest n whose Fibonacci number fits into an int64
+MAX_INT64_FIBO = 92
+
+
+def fibonacci_naive(n: int) -> int:
+    """The exponential time recursive definition."""
+    if n <= 1:
+        return n
+    else:
+        return fibonacci_naive(n - 1) + fibonacci_naive(n - 2)
+
+
+@lru_cache(maxsize=MEMO_CACHE_SIZE)
+def fibonacci_memoized(n: int) -> int:
+    """
+    The recursive definition, with the results cached.
+
+    Every number is computed once, which makes it linear, but the recursion depth is
+    still n, so it can't compute numbers beyond the recursion limit from scratch.
+    """
+    if n <= 1:
+        return n
+    return fibonacci_memoized(n - 1) + fibonacci_memoized(n - 2)
+
+
+def fibonacci_iterative(n: int) -> int:
+    """The linear time loop, keeping the last two numbers."""
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+
+
+def fibonacci_fast_doubling(n: int) -> int:
+    """
+    The O(log n) fast doubling method.
+
+    It walks the bits of n from the highest, using F(2k) = F(k) * (2F(k+1) - F(k))
+    and F(2k+1) = F(k)^2 + F(k+1)^2.
+    """
+    a, b = 0, 1  # F(k), F(k+1)
+    for bit in bin(n)[2:]:
+        a, b = a * (2 * b - a), a * a + b * b
+        if bit == "1":
+            a, b = b, a + b
+    return a
+
+
+def fibonacci_numpy_batch(ns: list[int]) -> list[int]:
+    """
+    The iterative method vectorized over a batch of inputs.
+
+    Every input is advanced in the same loop, masked out once it reaches its n.
+    The numbers are int64 while they fit, Python integers otherwise.
+    """
+    ns = np.asarray(ns)
+    dtype = np.int64 if ns.max(initial=0) <= MAX_INT64_FIBO else object
+    a = np.zeros(len(ns), dtype=dtype)
+    b = np.ones(len(ns), dtype=dtype)
+    for step in range(ns.max(initial=0)):
+        active = step < ns
+        a[active], b[active] = b[active], a[active] + b[active]
+    return a.tolist()
+
+
+def batch_of(fibonacci: callable) -> callable:
+    """Returns a batch kernel computing the inputs one by one with fibonacci."""
+
+    def batch(ns: list[int]) -> list[int]:
+        return [fibonacci(n) for n in ns]
+
+    return batch
+
+
+def fibonacci_numpy(n: int) -> int:
+    return fibonacci_numpy_batch([n])[0]
+
+
+@dataclass(frozen=True)
+class Kernel:
+    """A Fibonacci implementation the demos can be run with."""
+
+    name: str
+    # Computes a single Fibonacci number
+    fibonacci: callable
+    # Computes the Fibonacci numbers of a list of inputs
+    batch: callable
+
+
+# Every Fibonacci kernel, by name
+KERNELS: dict[str, Kernel] = {
+    "naive": Kernel("naive", fibonacci_naive, batch_of(fibonacci_naive)),
+    "memoized": Kernel("memoized", fibonacci_memoized, batch_of(fibonacci_memoized)),
+    "iterative": Kernel("iterative", fibonacci_iterative, batch_of(fibonacci_iterative)),
+    "fast_doubling": Kernel(
+        "fast_doubling", fibonacci_fast_doubling, batch_of(fibonacci_fast_doubling)
+    ),
+}
+if np is not None:
+    KERNELS["numpy"] = Kernel("numpy", fibonacci_numpy, fibonacci_numpy_batch)
+
+
+def get_kernel(name: str = None) -> Kernel:
+    """Returns the kernel called name, or the one selected by KERNEL_ENV_VAR if None."""
+    name = name or os.environ.get(KERNEL_ENV_VAR, DEFAULT_KERNEL)
+    if name not in KERNELS:
+        raise ValueError(f"Unknown kernel {name}, use one of {list(KERNELS)}.")
+    return KERNELS[name]
+
+
+def measure(func: callable, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """
+    Compare the Fibonacci kernels against running the naive one on threads and processes.
+
+    Every row computes the same tasks Fibonacci numbers. The naive kernel is also run
+    on as many threads, which the GIL serializes, and on as many processes.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--n", type=int, default=N_TH_FIBO)
+    parser.add_argument("--tasks", type=int, default=3)
+    parser.add_argument(
+        "--batch", type=int, default=100_000, help="Number of inputs of the batch rows."
+    )
+    args = parser.parse_args()
+    inputs = [args.n] * args.tasks
+
+    rows = []
+    for kernel in KERNELS.values():
+        fibonacci_memoized.cache_clear()
+        rows.append((kernel.name, measure(kernel.batch, inputs)))
+    executors = (("threads", ThreadPoolExecutor), ("processes", ProcessPoolExecutor))
+    for name, executor in executors:
+        with executor(args.tasks) as pool:
+            rows.append(
+                (
+                    f"naive, {args.tasks} {name}",
+                    measure(lambda: list(pool.map(fibonacci_naive, inputs))),
+                )
+            )
+
+    baseline = rows[0][1]
+    print(f"{args.tasks} x fibonacci({args.n}):")
+    print(f"{'kernel':>24} {'seconds':>10} {'speedup':>10}")
+    for name, seconds in rows:
+        print(f"{name:>24} {seconds:10.6f} {baseline / seconds:9.1f}x")
+
+    batch = [i % (MAX_INT64_FIBO + 1) for i in range(args.batch)]
+    print(f"A batch of {args.batch} fibonacci(0..{MAX_INT64_FIBO}):")
+    for kernel in KERNELS.values():
+        if kernel.name == "naive":
+            continue
+        fibonacci_memoized.cache_clear()
+        print(f"{kernel.name:>24} {measure(kernel.batch, batch):10.6f}")
+
+
+if __name__ == "__main__":
+    main()
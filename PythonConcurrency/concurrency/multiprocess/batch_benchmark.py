@@ -0,0 +1,86 @@
+import argparse
+import time
+
+from concurrency.functions import time_sync
+from concurrency.multiprocess.pipeline import Pipeline, Stage
+from concurrency.multiprocess.start_method import add_start_method_argument
+
+# Number of items sent through a channel at once
+BATCH_SIZES = (1, 10, 100, 1_000)
+
+
+def increment(item: int) -> int:
+    return item + 1
+
+
+def double(item: int) -> int:
+    return item * 2
+
+
+def square_batch(batch: list[int]) -> list[int]:
+    """A batched stage function, working on the whole batch at once."""
+    return [item * item for item in batch]
+
+
+def benchmark_batch_size(
+    num_of_items: int, batch_size: int, linger: float, start_method: str = None
+) -> float:
+    """
+    Send num_of_items tiny items through a three stage pipeline.
+
+    Returns:
+        float: The number of items per second, from feeding the first item until
+        receiving the last result.
+    """
+    pipeline = Pipeline(
+        [Stage(increment), Stage(double), Stage(square_batch, batched=True)],
+        start_method=start_method,
+        batch_size=batch_size,
+        linger=linger,
+    )
+    pipeline.start()
+    start = time.perf_counter()
+    pipeline.feed(range(num_of_items))
+    received = sum(1 for _ in pipeline.results())
+    elapsed = time.perf_counter() - start
+    pipeline.join()
+    assert received == num_of_items, f"{received} of {num_of_items} items received"
+    return num_of_items / elapsed
+
+
+@time_sync
+def main() -> None:
+    """
+    Measure the throughput of a pipeline of tiny stages against the batch size.
+
+    The work of the stages is negligible, so it shows the cost of moving the
+    items between the processes, which batching pays once per batch.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--linger", type=float, default=0.01)
+    add_start_method_argument(parser)
+    args = parser.parse_args()
+
+    results = [
+        (
+            batch_size,
+            benchmark_batch_size(args.items, batch_size, args.linger, args.start_method),
+        )
+        for batch_size in args.batch_sizes
+    ]
+
+    print(f"{args.items} items through 3 stages:")
+    print(f"{'batch size':>10} {'items/s':>12} {'speedup':>8}")
+    for batch_size, items_per_second in results:
+        print(
+            f"{batch_size:>10} {items_per_second:12.0f} "
+            f"{items_per_second / results[0][1]:7.1f}x"
+        )
+
+    print("Main finished ", end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import multiprocessing as mp
+
+from concurrency.functions import time_sync
+from concurrency.multiprocess.process_tester import DISPATCH_MODES, ProcessTester
+from concurrency.multiprocess.results_store import summarize
+from concurrency.multiprocess.start_method import add_start_method_argument
+
+# Number of items sorted by a task, from tiny tasks dominated by the dispatch
+# overhead to the default ProcessTester task
+INPUT_SIZES = (10, 100, 1_000, 8_000)
+
+
+def benchmark_dispatch(
+    num_of_processes: int,
+    num_of_tasks: int,
+    input_size: int,
+    dispatch: str,
+    chunk_size: int = 1,
+    repeats: int = 3,
+    start_method: str = None,
+) -> dict[str, float]:
+    """
+    Measure how long it takes to sort num_of_tasks inputs on a fixed pool.
+
+    Args:
+        num_of_processes (int): Number of worker processes.
+        num_of_tasks (int): Number of tasks run in every repeat.
+        input_size (int): Number of items each task sorts.
+        dispatch (str): How the chunks reach the workers, see DISPATCH_MODES.
+        chunk_size (int): Number of tasks sent to a worker at once.
+        repeats (int): Number of measured repeats, after one warm-up repeat.
+        start_method (str): The multiprocessing start method, the default if None.
+
+    Returns:
+        dict[str, float]: The summary of the measured seconds, see summarize.
+    """
+    pt = ProcessTester(
+        num_of_cores=num_of_tasks,
+        max_num_of_processes=num_of_processes,
+        chunk_size=chunk_size,
+        input_size=input_size,
+        workload="timsort",
+        dispatch=dispatch,
+        start_method=start_method,
+    )
+    try:
+        pt.resize(num_of_processes)
+        pt.run_iteration()
+        samples = [pt.run_iteration() for _ in range(repeats)]
+    except BaseException:
+        # The queues may still hold the tasks of the failed repeat
+        pt.terminate()
+        raise
+    pt.shutdown()
+    return summarize(samples)
+
+
+@time_sync
+def main() -> None:
+    """
+    Compare the dispatch modes of ProcessTester across task granularities.
+
+    Every task is sent on its own by default, so the smaller the tasks, the more
+    the time is dominated by the queues instead of the sorting.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--processes", type=int, default=mp.cpu_count())
+    parser.add_argument("--tasks", type=int, default=2_000)
+    parser.add_argument("--chunk-size", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--input-sizes", type=int, nargs="+", default=INPUT_SIZES)
+    add_start_method_argument(parser)
+    args = parser.parse_args()
+
+    results = {
+        (input_size, dispatch): benchmark_dispatch(
+            args.processes,
+            args.tasks,
+            input_size,
+            dispatch,
+            args.chunk_size,
+            args.repeats,
+            args.start_method,
+        )
+        for input_size in args.input_sizes
+        for dispatch in DISPATCH_MODES
+    }
+
+    print(
+        f"{args.tasks} tasks on {args.processes} processes, "
+        f"{args.chunk_size} task(s) per chunk:"
+    )
+    print(f"{'input size':>10} " + " ".join(f"{mode:>12}" for mode in DISPATCH_MODES))
+    for input_size in args.input_sizes:
+        print(
+            f"{input_size:>10} "
+            + " ".join(
+                f"{results[input_size, mode]['mean']:11.3f}s" for mode in DISPATCH_MODES
+            )
+        )
+
+    print("Main finished ", end="")
+
+
+if __name__ == "__main__":
+    main()
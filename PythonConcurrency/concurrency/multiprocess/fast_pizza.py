@@ -1,4 +1,4 @@
-import multiprocessing as mp
+import argparse
 
 from concurrency.functions import time_sync
 from concurrency.multiprocess.pizza import (
@@ -8,25 +8,16 @@ from concurrency.multiprocess.pizza import (
     bake_pizza,
     PIZZA_REQUIRED
 )
+from concurrency.multiprocess.pipeline import Pipeline, Stage
+from concurrency.multiprocess.start_method import (
+    add_start_method_argument,
+    report_startup,
+)
 
 
-def pizza_worker(work_to_do: callable, inp_cn: mp.Queue, outp_cn: mp.Queue) -> None:
-    """
-    A worker process, that executes a specific pizza job.
-
-    It takes the next input from its input data channel, carries out its task
-    and places its result into its output channel.
-    """
-    while inp := inp_cn.get():
-        result = work_to_do(inp)
-        outp_cn.put(result)
-    outp_cn.put(None)
-    print("Worker finished.")
-
-
-def process_results(result_cn: mp.Queue) -> None:
+def process_results(results) -> None:
     """Simple process that lets you know if you can start eating your pizza."""
-    while res := result_cn.get():
+    for res in results:
         print(f"Pizza {res} is ready.")
     print("Every pizza is ready now, enjoy! :)")
 
@@ -42,44 +33,69 @@ def main() -> None:
     writes and worker (n+1) reads it. When the 1th worker is done, None is placed into
     the 1th channel, which will propagate through the channels and signal every worker
     process to finish.
+    Every worker is run by the Pipeline engine, where every step can be done by
+    several people in parallel, e.g. by more bakers if baking is the slowest step.
+    The workers are started with the chosen start method, and the time it took each
+    of them to get ready is reported before the baking starts.
     """
-    # Create the data channels, Queues specifically in this case
-    stretch_cn, top_cn, bake_cn, ready_cn = (
-        mp.Queue(),
-        mp.Queue(),
-        mp.Queue(),
-        mp.Queue(),
+    parser = argparse.ArgumentParser(description="The fast pizza process.")
+    parser.add_argument(
+        "--replicas",
+        type=int,
+        nargs=3,
+        default=[1, 1, 1],
+        metavar=("STRETCHERS", "TOPPERS", "BAKERS"),
+        help="Number of worker processes of the stretching, topping and baking steps.",
     )
-
-    # Every process will be placed into this processes list
-    processes: list[mp.Process] = []
-    processes.append(
-        mp.Process(target=pizza_worker, args=(stretch_dough, stretch_cn, top_cn))
+    parser.add_argument(
+        "--capacity",
+        type=int,
+        default=0,
+        help="Maximum number of batches waiting between two steps, unbounded if 0.",
     )
-    processes.append(
-        mp.Process(target=pizza_worker, args=(place_toppings, top_cn, bake_cn))
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Maximum number of pizzas passed on from one step to the next at once.",
     )
-    processes.append(
-        mp.Process(target=pizza_worker, args=(bake_pizza, bake_cn, ready_cn))
+    parser.add_argument(
+        "--ordered",
+        action="store_true",
+        help="Serve the pizzas in the order their dough balls were formed.",
+    )
+    add_start_method_argument(parser)
+    args = parser.parse_args()
+
+    stretchers, toppers, bakers = args.replicas
+    pipeline = Pipeline(
+        [
+            Stage(stretch_dough, stretchers),
+            Stage(place_toppings, toppers),
+            Stage(bake_pizza, bakers),
+        ],
+        sink=process_results,
+        start_method=args.start_method,
+        capacity=args.capacity,
+        batch_size=args.batch_size,
+        ordered=args.ordered,
     )
 
-    processes.append(mp.Process(target=process_results, args=(ready_cn,)))
-
-    # Start the workers
-    for p in processes:
-        p.start()
+    # Start the workers, and wait until every one of them is ready
+    pipeline.start()
+    print(
+        f"Started with {pipeline.context.get_start_method()}: "
+        f"{report_startup(list(pipeline.startup_latencies.values()))}."
+    )
 
     # Start making the dough balls and pass them to the next worker (pizza dough stretcher).
     # Every consecutive channel / worker will be automatically handled by the worker processes.
-    for d in form_dough_balls(PIZZA_REQUIRED):
-        stretch_cn.put(d)
-
-    # When every dough ball is ready, signal it to the workers
-    stretch_cn.put(None)
+    # When every dough ball is ready, it is signaled to the workers.
+    pipeline.feed(form_dough_balls(PIZZA_REQUIRED))
 
     # Wait for every worker / process to finish
-    for p in processes:
-        p.join()
+    pipeline.join()
+    print(pipeline.report())
 
 
 if __name__ == "__main__":
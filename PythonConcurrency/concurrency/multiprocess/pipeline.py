@@ -0,0 +1,582 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from multiprocessing.synchronize import BoundedSemaphore
+
+from concurrency.multiprocess.start_method import get_context, start_processes
+
+# Number of seconds between two samples of the depth of the channels
+DEPTH_SAMPLE_INTERVAL = 0.01
+# Default number of seconds a partial batch may wait for more items before it is sent
+LINGER = 0.01
+# Default maximum number of items in flight in ordered mode, which bounds the reorder buffer
+REORDER_WINDOW = 1024
+# Number of seconds to wait for the pipeline to progress before checking if a process died
+LIVENESS_INTERVAL = 1.0
+
+
+@dataclass(frozen=True)
+class Stage:
+    """A step of a Pipeline, run by replicas worker processes in parallel."""
+
+    # Turns an input item into an output item
+    func: callable
+    # Number of worker processes running the stage
+    replicas: int = 1
+    # If set, func turns a list of input items into the list of output items at once
+    batched: bool = False
+
+    @property
+    def name(self) -> str:
+        return self.func.__name__
+
+
+@dataclass
+class ReplicaStats:
+    """What a worker process of a stage spent its time with."""
+
+    # Index of the stage
+    stage: int
+    # Number of items processed
+    items: int = 0
+    # Number of batches processed
+    batches: int = 0
+    # Seconds spent waiting for an input, i.e. starved by the previous stage
+    get_wait: float = 0.0
+    # Seconds spent processing the items
+    busy: float = 0.0
+    # Seconds spent waiting for room in the full output channel, i.e. backpressure
+    put_wait: float = 0.0
+    # Seconds from the start of the worker until it got the None signal
+    elapsed: float = 0.0
+    # The traceback of the exception the stage raised, None if it didn't fail
+    error: str | None = None
+    # Number of items dropped after the stage failed
+    dropped: int = 0
+
+
+@dataclass(frozen=True)
+class Skipped:
+    """
+    Stands in for an item dropped by a failed stage in ordered mode.
+
+    It keeps the sequence numbers contiguous, so the items after it are still
+    released from the reorder buffer.
+    """
+
+    # Index of the stage that dropped the item
+    stage: int
+
+
+class Batcher:
+    """
+    Collects items into batches, and puts them into a channel.
+
+    A batch is sent once it has batch_size items, or once its first item has been
+    waiting for linger seconds, whichever comes first.
+    """
+
+    # The channel the batches are put into
+    channel: mp.Queue
+    # Maximum number of items in a batch
+    batch_size: int
+    # Number of seconds the first item of a partial batch may wait
+    linger: float
+    # The items of the next batch
+    items: list
+    # When the first item of the next batch was added
+    first_at: float
+    # Seconds spent waiting for room in the channel
+    put_wait: float
+    # Called every LIVENESS_INTERVAL seconds while the channel stays full, if set
+    liveness_check: callable
+
+    def __init__(
+        self,
+        channel: mp.Queue,
+        batch_size: int,
+        linger: float,
+        liveness_check: callable = None,
+    ) -> None:
+        self.channel = channel
+        self.batch_size = batch_size
+        self.linger = linger
+        self.liveness_check = liveness_check
+        self.items = []
+        self.first_at = 0.0
+        self.put_wait = 0.0
+
+    def remaining(self) -> float | None:
+        """Seconds until the partial batch is due, None if there is no partial batch."""
+        if not self.items:
+            return None
+        return max(0.0, self.first_at + self.linger - time.perf_counter())
+
+    def add(self, items: list) -> None:
+        """Add items, sending every full batch, and the partial one if it is due."""
+        if not self.items:
+            self.first_at = time.perf_counter()
+        self.items.extend(items)
+        while len(self.items) >= self.batch_size:
+            self.send(self.items[: self.batch_size])
+            self.items = self.items[self.batch_size :]
+            self.first_at = time.perf_counter()
+        if self.items and self.remaining() == 0:
+            self.flush()
+
+    def flush(self) -> None:
+        """Send the partial batch, if there is one."""
+        if self.items:
+            self.send(self.items)
+            self.items = []
+
+    def send(self, batch: list | None) -> None:
+        start = time.perf_counter()
+        if self.liveness_check is None:
+            self.channel.put(batch)
+        else:
+            while True:
+                try:
+                    self.channel.put(batch, timeout=LIVENESS_INTERVAL)
+                    break
+                except queue.Full:
+                    self.liveness_check()
+        self.put_wait += time.perf_counter() - start
+
+
+def receive(channel: mp.Queue, window: BoundedSemaphore = None):  # -> Generator[item]
+    """
+    Yield the items of the batches arriving on a channel, until it receives None.
+
+    With a window the items are tagged with their sequence numbers, and they are
+    yielded in that order. The early ones wait in the reorder buffer, which never
+    holds more items than the window, as every item yielded frees a slot of it.
+    """
+    if window is None:
+        while (batch := channel.get()) is not None:
+            yield from batch
+        return
+    pending = {}
+    next_seq = 0
+    while (batch := channel.get()) is not None:
+        pending.update(batch)
+        while next_seq in pending:
+            item = pending.pop(next_seq)
+            next_seq += 1
+            window.release()
+            if not isinstance(item, Skipped):
+                yield item
+
+
+def sink_worker(sink: callable, channel: mp.Queue, window: BoundedSemaphore) -> None:
+    """A process running the sink of a pipeline on the results of the last channel."""
+    sink(receive(channel, window))
+
+
+def stage_worker(
+    stage: Stage,
+    inp_cn: mp.Queue,
+    outp_cn: mp.Queue,
+    stats_cn: mp.Queue,
+    index: int,
+    batch_size: int,
+    linger: float,
+    ordered: bool,
+) -> None:
+    """
+    A worker process, that executes a specific stage of the pipeline.
+
+    It takes the next batch from its input data channel, carries out its task on
+    every item, or on the whole batch if the stage is batched, and collects the results
+    into batches for its output channel, until it receives None.
+    While a partial output batch is lingering, it only waits for the input until the
+    batch is due. At the end it sends what it spent its time with to the stats channel.
+    If the pipeline is ordered, the items are (sequence number, item) pairs, and the
+    results keep the sequence number of their input.
+    If the stage raises, the worker reports the error in its stats, and drops the rest
+    of its input until the None, so the stages before it never block. In ordered mode
+    the dropped items are passed on as Skipped, which still releases their window.
+    """
+    stats = ReplicaStats(index)
+    outbox = Batcher(outp_cn, batch_size, linger)
+    start = time.perf_counter()
+    while True:
+        t0 = time.perf_counter()
+        try:
+            batch = inp_cn.get(timeout=outbox.remaining())
+        except queue.Empty:
+            stats.get_wait += time.perf_counter() - t0
+            outbox.flush()
+            continue
+        t1 = time.perf_counter()
+        stats.get_wait += t1 - t0
+        if batch is None:
+            break
+        skipped = []
+        if ordered:
+            # The items dropped by a failed stage before only pass through
+            skipped = [(seq, item) for seq, item in batch if isinstance(item, Skipped)]
+            batch = [(seq, item) for seq, item in batch if not isinstance(item, Skipped)]
+        if stats.error is None and batch:
+            items = [item for _, item in batch] if ordered else batch
+            try:
+                results = (
+                    stage.func(items) if stage.batched else [stage.func(i) for i in items]
+                )
+            except Exception:
+                stats.error = traceback.format_exc()
+                print(f"Worker of {stage.name} failed, dropping the rest of its input.")
+            else:
+                if ordered:
+                    results = [(seq, result) for (seq, _), result in zip(batch, results)]
+                stats.busy += time.perf_counter() - t1
+                outbox.add(results + skipped)
+                stats.items += len(batch)
+                stats.batches += 1
+                continue
+        stats.dropped += len(batch)
+        if ordered:
+            outbox.add([(seq, Skipped(index)) for seq, _ in batch] + skipped)
+    outbox.flush()
+    stats.put_wait = outbox.put_wait
+    stats.elapsed = time.perf_counter() - start
+    stats_cn.put(stats)
+    print(f"Worker of {stage.name} finished.")
+
+
+class Pipeline:
+    """
+    A chain of stages connected by data channels, each stage run by its own processes.
+
+    Stage n reads channel n and writes channel n+1. The items are fed into the first
+    channel, and the results come out of the last one, either read by the sink process
+    or by results().
+    The channels can be bounded, then a stage blocks when the next one can't keep up,
+    which keeps the number of items in flight, i.e. the memory, bounded.
+    The channels carry batches of items, so the cost of a channel round-trip is paid
+    once per batch. A partial batch is sent after lingering, to keep the latency bounded.
+    With several replicas the results may overtake each other. In ordered mode the
+    items are tagged with sequence numbers, and the results are put back into the input
+    order at the end, while the number of items in flight is bounded by a window.
+    Every replica of a stage stops on its own None, so a stage gets as many of them
+    as it has replicas. The next stage only gets its ones after every replica of the
+    stage has exited, so no result is left behind the None signals.
+    """
+
+    # The stages, in order
+    stages: list[Stage]
+    # Process reading the results from the last channel, if set
+    sink: callable
+    # The multiprocessing context the processes and channels are created with
+    context: mp.context.BaseContext
+    # Maximum number of batches in a data channel, unbounded if 0
+    capacity: int
+    # Maximum number of items in a batch
+    batch_size: int
+    # Number of seconds a partial batch may wait for more items before it is sent
+    linger: float
+    # Collects the fed items into batches for the first channel
+    inbox: Batcher
+    # Limits the number of items in flight in ordered mode, None in unordered mode
+    window: BoundedSemaphore | None
+    # Sequence number of the next fed item in ordered mode
+    next_seq: int
+    # The data channels, one more than the stages
+    channels: list[mp.Queue]
+    # The workers report their ReplicaStats here when they finish
+    stats_cn: mp.Queue
+    # The ReplicaStats of every finished worker
+    replica_stats: list[ReplicaStats]
+    # The sampled depths of every channel
+    depth_samples: list[list[int]]
+    # Set when the depth sampling should stop
+    finished: threading.Event
+    # The worker processes of every stage
+    stage_processes: list[list[mp.Process]]
+    # The sink process, if there is a sink
+    sink_process: mp.Process | None
+    # Number of seconds it took every process to get ready, by name
+    startup_latencies: dict[str, float]
+    # Thread passing the None signals on from stage to stage, once the input is closed
+    propagator: threading.Thread | None
+    # The stage processes the propagator found dead, losing the items they held
+    dead_replicas: list[mp.Process]
+
+    def __init__(
+        self,
+        stages: list[Stage],
+        sink: callable = None,
+        start_method: str = None,
+        capacity: int = 0,
+        batch_size: int = 1,
+        linger: float = LINGER,
+        ordered: bool = False,
+        window: int = REORDER_WINDOW,
+    ) -> None:
+        """
+        Initialize the Pipeline, without starting it.
+
+        Args:
+            stages (list): The stages, in order.
+            sink (callable): Run in its own process with an iterator of the results.
+                If None, read the results with results().
+            start_method (str): The multiprocessing start method, the default if None.
+            capacity (int): Maximum number of batches in a data channel, unbounded if 0.
+                With bounded channels and without a sink, the results have to be read
+                while the input is fed, otherwise feeding blocks once every channel is full.
+            batch_size (int): Maximum number of items sent through a channel at once.
+            linger (float): Number of seconds a partial batch may wait for more items.
+                The fed items are only checked when the next one is fed, see flush().
+            ordered (bool): Whether the results keep the order of the fed items.
+                A batched stage has to return one result for every input then.
+                It needs a sink, as feeding blocks until the results free up the
+                window, which results() would only read after feeding.
+            window (int): Maximum number of items in flight in ordered mode, feeding
+                blocks while the reorder buffer waits for an early item.
+
+        Raises:
+            ValueError: If ordered is set without a sink.
+        """
+        if ordered and sink is None:
+            raise ValueError(
+                "The ordered mode needs a sink, otherwise feeding more than window "
+                "items blocks before results() could read them."
+            )
+        self.stages = stages
+        self.sink = sink
+        self.context = get_context(start_method)
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.linger = linger
+        self.channels = [
+            self.context.Queue(maxsize=capacity) for _ in range(len(stages) + 1)
+        ]
+        self.inbox = Batcher(self.channels[0], batch_size, linger, self.check_processes)
+        self.window = self.context.BoundedSemaphore(window) if ordered else None
+        self.next_seq = 0
+        self.stats_cn = self.context.Queue()
+        self.replica_stats = []
+        self.depth_samples = [[] for _ in self.channels]
+        self.finished = threading.Event()
+        self.stage_processes = []
+        self.sink_process = None
+        self.startup_latencies = {}
+        self.propagator = None
+        self.dead_replicas = []
+
+    def __enter__(self) -> "Pipeline":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is not None:
+            # The input may never be closed, the processes would wait for it forever
+            self.terminate()
+            return
+        self.join()
+
+    def start(self) -> None:
+        """Start the processes of every stage and the sink, waiting until they are ready."""
+        targets = [
+            (
+                stage_worker,
+                (
+                    stage,
+                    self.channels[i],
+                    self.channels[i + 1],
+                    self.stats_cn,
+                    i,
+                    self.batch_size,
+                    self.linger,
+                    self.window is not None,
+                ),
+            )
+            for i, stage in enumerate(self.stages)
+            for _ in range(stage.replicas)
+        ]
+        if self.sink:
+            targets.append((sink_worker, (self.sink, self.channels[-1], self.window)))
+        processes, self.startup_latencies = start_processes(self.context, targets)
+
+        for stage in self.stages:
+            self.stage_processes.append(processes[: stage.replicas])
+            processes = processes[stage.replicas :]
+        if self.sink:
+            self.sink_process = processes[0]
+        threading.Thread(target=self.sample_depths, daemon=True).start()
+
+    def sample_depths(self) -> None:
+        """Sample the number of items waiting in every channel until the pipeline finishes."""
+        while not self.finished.wait(DEPTH_SAMPLE_INTERVAL):
+            for samples, channel in zip(self.depth_samples, self.channels):
+                try:
+                    samples.append(channel.qsize())
+                except NotImplementedError:  # qsize() is not available on macOS
+                    return
+
+    def put(self, item: object) -> None:
+        """
+        Feed an item into the first stage.
+
+        In ordered mode it blocks while the window is full. The partial batch is sent
+        before blocking, as the window may be waiting for the items in it.
+        """
+        if self.window is not None:
+            if not self.window.acquire(block=False):
+                self.flush()
+                while not self.window.acquire(timeout=LIVENESS_INTERVAL):
+                    self.check_processes()
+            item = (self.next_seq, item)
+            self.next_seq += 1
+        self.inbox.add([item])
+
+    def flush(self) -> None:
+        """Send the fed items still waiting for their batch to fill up."""
+        self.inbox.flush()
+
+    def feed(self, items) -> None:
+        """Feed every item into the first stage, then close the input."""
+        for item in items:
+            self.put(item)
+        self.close()
+
+    def close(self) -> None:
+        """Signal the end of the input, which propagates through every stage."""
+        self.flush()
+        for _ in range(self.stages[0].replicas):
+            self.inbox.send(None)
+        self.propagator = threading.Thread(target=self.propagate, daemon=True)
+        self.propagator.start()
+
+    def propagate(self) -> None:
+        """
+        Wait for every stage to exit in order, and signal the end to the next one.
+
+        The replicas which died are recorded in dead_replicas, for join() to fail on.
+        The next stage still gets its None signals, so the rest of the pipeline finishes.
+        """
+        for i, processes in enumerate(self.stage_processes):
+            for p in processes:
+                p.join()
+            self.dead_replicas.extend(p for p in processes if p.exitcode != 0)
+            next_replicas = self.stages[i + 1].replicas if i + 1 < len(self.stages) else 1
+            for _ in range(next_replicas):
+                self.channels[i + 1].put(None)
+
+    def results(self):  # -> Generator[result]
+        """Yield the results from the last channel until the pipeline finishes."""
+        yield from receive(self.channels[-1], self.window)
+
+    def join(self) -> None:
+        """
+        Wait for every process to finish, the input has to be closed before.
+
+        Raises:
+            RuntimeError: If a stage raised an exception, or a process died.
+        """
+        try:
+            for waited in (self.propagator, self.sink_process):
+                if waited is None:
+                    continue
+                waited.join(LIVENESS_INTERVAL)
+                while waited.is_alive():
+                    self.check_processes()
+                    waited.join(LIVENESS_INTERVAL)
+            if self.dead_replicas:
+                raise RuntimeError(
+                    f"Process {self.dead_replicas[0].name} of the pipeline died with exit code "
+                    f"{self.dead_replicas[0].exitcode}, the items it held were lost."
+                )
+            while len(self.replica_stats) < sum(stage.replicas for stage in self.stages):
+                try:
+                    self.replica_stats.append(self.stats_cn.get(timeout=LIVENESS_INTERVAL))
+                except queue.Empty:
+                    self.check_processes()
+            self.check_processes()
+        finally:
+            self.finished.set()
+        if failed := [s for s in self.replica_stats if s.error is not None]:
+            raise RuntimeError(
+                f"Stage {self.stages[failed[0].stage].name} failed, "
+                f"{sum(s.dropped for s in failed)} items were dropped:\n{failed[0].error}"
+            )
+
+    def processes(self) -> list[mp.Process]:
+        """Returns every started process of the pipeline."""
+        sink = [self.sink_process] if self.sink_process else []
+        return [p for processes in self.stage_processes for p in processes] + sink
+
+    def check_processes(self) -> None:
+        """
+        Terminate the pipeline if one of its processes died, as it could never finish then.
+
+        Raises:
+            RuntimeError: If a process exited with a non-zero exit code.
+        """
+        if dead := [p for p in self.processes() if p.exitcode not in (None, 0)]:
+            self.terminate()
+            raise RuntimeError(
+                f"Process {dead[0].name} of the pipeline died with exit code {dead[0].exitcode}."
+            )
+
+    def terminate(self) -> None:
+        """Kill every process of the pipeline, without waiting for the items in flight."""
+        for p in self.processes():
+            p.terminate()
+        for p in self.processes():
+            p.join()
+        self.finished.set()
+
+    def metrics(self) -> list[dict]:
+        """
+        Returns the metrics of every stage, once the pipeline has been joined.
+
+        The utilization is the share of the time the workers of the stage spent
+        processing items, the saturated stage is the one with the highest.
+        The queue depths are measured in batches.
+        """
+        metrics = []
+        for i, stage in enumerate(self.stages):
+            stats = [s for s in self.replica_stats if s.stage == i]
+            elapsed = max((s.elapsed for s in stats), default=0.0)
+            items = sum(s.items for s in stats)
+            depths = self.depth_samples[i]
+            metrics.append(
+                {
+                    "stage": stage.name,
+                    "replicas": stage.replicas,
+                    "items": items,
+                    "batches": sum(s.batches for s in stats),
+                    "items_per_second": items / elapsed if elapsed else 0.0,
+                    "utilization": (
+                        sum(s.busy for s in stats) / sum(s.elapsed for s in stats)
+                        if elapsed
+                        else 0.0
+                    ),
+                    "get_wait": sum(s.get_wait for s in stats),
+                    "put_wait": sum(s.put_wait for s in stats),
+                    "max_queue_depth": max(depths, default=0),
+                    "mean_queue_depth": sum(depths) / len(depths) if depths else 0.0,
+                }
+            )
+        return metrics
+
+    def report(self) -> str:
+        """Returns a human readable table of the metrics, naming the saturated stage."""
+        metrics = self.metrics()
+        lines = [
+            f"{'stage':>16} {'replicas':>8} {'items/s':>9} {'util':>6} {'get wait':>9} "
+            f"{'put wait':>9} {'max depth':>9} {'mean depth':>10}"
+        ]
+        for m in metrics:
+            lines.append(
+                f"{m['stage']:>16} {m['replicas']:>8} {m['items_per_second']:9.2f} "
+                f"{m['utilization']:6.1%} {m['get_wait']:8.2f}s {m['put_wait']:8.2f}s "
+                f"{m['max_queue_depth']:>9} {m['mean_queue_depth']:10.2f}"
+            )
+        saturated = max(metrics, key=lambda m: m["utilization"])
+        lines.append(f"Saturated stage: {saturated['stage']}")
+        return "\n".join(lines)
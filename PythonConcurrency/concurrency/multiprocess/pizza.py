@@ -1,7 +1,9 @@
 import time
 
-STEP_PROCESS_SIZE = 100_000_000 # This parameter defines how much time each function takes to complete
-PIZZA_REQUIRED = 5
+from concurrency.settings import env_param
+
+STEP_PROCESS_SIZE = env_param("PIZZA_STEP_SIZE", 100_000_000) # This parameter defines how much time each function takes to complete
+PIZZA_REQUIRED = env_param("PIZZAS", 5)
 
 
 def form_dough_balls(dough: object):  # -> Generator[doughBall]
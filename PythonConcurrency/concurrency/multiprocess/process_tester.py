@@ -1,29 +1,37 @@
+import argparse
+import math
+import queue
 import time
 import random
+import traceback
 import multiprocessing as mp
-import matplotlib.pyplot as plt
+from multiprocessing import resource_tracker
 
 from concurrency.functions import time_sync
+from concurrency.multiprocess.results_store import (
+    RESULTS_DIR,
+    environment_metadata,
+    save_run,
+    summarize,
+)
+from concurrency.multiprocess.scaling import amdahl_speedup, analyze, report
+from concurrency.multiprocess.shared_payload import SharedPayload, resolve
+from concurrency.multiprocess.start_method import (
+    add_start_method_argument,
+    get_context,
+    report_startup,
+)
+from concurrency.multiprocess.workloads import WORKLOADS
 
-@time_sync
-def bubble_sort(lst):
-    """Bubble Sort algorithm.
-    
-    A really simple implementation of the bubble sort algorithm to utilize the CPU.
-    It repeatedly compares adjacent elements and swaps them if they are out of order.
-    """
-    n = len(lst)
-    for i in range(n):
-        swapped = False
-        for j in range(
-            0, n - i - 1
-        ):
-            if lst[j] > lst[j + 1]:
-                lst[j], lst[j + 1] = lst[j + 1], lst[j]
-                swapped = True
-        if not swapped:
-            break
-    print(f"Sorted array ", end="")
+# How the chunks of tasks reach the workers: through one shared queue, through a
+# queue per worker filled round-robin, or through a queue per worker with work stealing
+DISPATCH_MODES = ("shared", "round-robin", "stealing")
+# Number of seconds a stealing worker waits on its own queue before it tries to steal
+STEAL_INTERVAL = 0.005
+# Number of seconds the events are waited for before checking that the workers are alive
+LIVENESS_INTERVAL = 1.0
+# Default number of times every iteration is measured, compare() needs at least 2
+REPEATS = 5
 
 
 class ProcessTester:
@@ -32,33 +40,142 @@ class ProcessTester:
 
     This class runs and evaluates the execution of parallel CPU-bound tasks using multiple
     CPU cores. The end product is a scatter plot which shows how a certain number of parallel 
-    tasks run, using various number of CPU cores.
+    tasks run, using various number of CPU cores, next to the speedup and the fitted
+    Amdahl curve, from which the optimal number of worker processes can be read off.
+
+    The worker processes are kept alive between the iterations, the pool is only
+    resized, so spawning the processes is measured separately from executing the tasks.
+    The task inputs are either pickled through the task queue, or placed into shared
+    memory, in which case the workers only receive a handle and sort the data in place.
+    The sorting engine is picked from the WORKLOADS registry.
+    The chunks are dispatched through a single shared queue, or through a queue per
+    worker, from which idle workers may steal, see DISPATCH_MODES.
+    The workers are started with the configured start method, and the startup latency
+    of every worker is measured from its start until it is ready to take tasks.
     """
 
-    def __init__(self, num_of_cores: int, max_num_of_processes: int) -> None:
+    def __init__(
+        self,
+        num_of_cores: int,
+        max_num_of_processes: int,
+        chunk_size: int = None,
+        input_size: int = 8_000,
+        payload: str = "pickle",
+        workload: str = "bubble",
+        repeats: int = REPEATS,
+        dispatch: str = "shared",
+        start_method: str = None,
+    ) -> None:
         """
         Initialize the ProcessTester with a specific number of cores and max processes.
 
         Args:
-            num_of_cores (int): Number of worker processes.
+            num_of_cores (int): Number of tasks run in every iteration.
+            max_num_of_processes (int): Number of worker processes in the last iteration.
+            chunk_size (int): Number of tasks sent to a worker at once. By default
+                every worker gets about 4 chunks.
+            input_size (int): Number of items each task sorts.
+            payload (str): How the inputs reach the workers, "pickle" sends them
+                through the task queue, "shared" places them into shared memory.
+            workload (str): Name of the sorting engine, see WORKLOADS.
+            repeats (int): Number of times every iteration is measured.
+            dispatch (str): How the chunks reach the workers, see DISPATCH_MODES.
+            start_method (str): The multiprocessing start method, see START_METHODS.
+                The platform default if None.
         """
+        if payload not in ("pickle", "shared"):
+            raise ValueError(f"Unknown payload mode {payload}, use pickle or shared.")
+        if workload not in WORKLOADS:
+            raise ValueError(f"Unknown workload {workload}, use one of {list(WORKLOADS)}.")
+        if dispatch not in DISPATCH_MODES:
+            raise ValueError(f"Unknown dispatch mode {dispatch}, use one of {DISPATCH_MODES}.")
         self.num_of_cores = num_of_cores
         self.max_num_of_processes = max_num_of_processes
-        self.task_queue = mp.Queue()
+        self.chunk_size = chunk_size
+        self.input_size = input_size
+        self.payload = payload
+        self.workload = WORKLOADS[workload]
+        self.repeats = repeats
+        self.dispatch = dispatch
+        self.context = get_context(start_method)
+        if payload == "shared":
+            # The workers have to inherit the resource tracker of this process, otherwise
+            # they start their own one, which destroys the shared memory when they exit
+            resource_tracker.ensure_running()
+        self.task_queue = self.context.Queue()
+        # The own queue of every worker, by its index, unless the dispatch is shared.
+        # The workers are stopped in reverse order, so the queues of the running
+        # workers are always the first ones.
+        self.worker_queues = (
+            [self.context.Queue() for _ in range(max_num_of_processes)]
+            if dispatch != "shared"
+            else []
+        )
+        # Index of the worker queue the next chunk is put into
+        self.next_worker = 0
+        # The workers report here when they are ready, finish a chunk or exit
+        self.event_queue = self.context.Queue()
+        self.workers: list[mp.Process] = []
+        # Mean steady-state execution time of every iteration
         self.results = []
-    
+        # Every measured steady-state execution time of every iteration
+        self.samples: list[list[float]] = []
+        # Time it took to resize the pool before every iteration
+        self.startup_results = []
+        # Startup latency of every worker started before every iteration
+        self.worker_startup: list[list[float]] = []
+
     @staticmethod
-    def worker(task_queue: mp.Queue) -> None:
+    def worker(
+        task_queue: mp.Queue, event_queue: mp.Queue, steal_from: list[mp.Queue] = ()
+    ) -> None:
         """
-        Worker process to execute a task from the queue.
+        Worker process to execute chunks of tasks from the queue.
+
+        It reports on the event queue when it is ready, when it has finished
+        a chunk and when it exits. A task raising an exception is reported as an
+        error, and the worker carries on. Shared memory handles among the arguments
+        are resolved to the data they point to.
+        If its queue is empty, it steals chunks from the steal_from queues.
         """
+        name = mp.current_process().name
+        event_queue.put(("ready", (name, time.time())))
+        while chunk := ProcessTester.next_chunk(task_queue, steal_from):
+            print(f"Worker process {name} is executing {len(chunk)} tasks.")
+            for func, args in chunk:
+                try:
+                    with resolve(args) as resolved_args:
+                        func(*resolved_args)
+                except Exception:
+                    event_queue.put(("error", (name, traceback.format_exc())))
+            event_queue.put(("done", len(chunk)))
+        event_queue.put(("exit", name))
 
-        while task := task_queue.get():
-            func, args = task
-            print(
-                f"Worker process {mp.current_process().name} is executing a task."
-            )
-            func(*args)
+    @staticmethod
+    def next_chunk(task_queue: mp.Queue, steal_from: list[mp.Queue]) -> list | None:
+        """
+        Returns the next chunk of the worker, or None if it has to stop.
+
+        Without queues to steal from, it simply blocks on the own queue of the worker.
+        Otherwise it polls the own queue, and steals from the first non-empty other
+        queue while it is empty. Stop signals are never stolen, they are put back.
+        """
+        if not steal_from:
+            return task_queue.get()
+        while True:
+            try:
+                return task_queue.get(timeout=STEAL_INTERVAL)
+            except queue.Empty:
+                pass
+            for other in steal_from:
+                try:
+                    chunk = other.get_nowait()
+                except queue.Empty:
+                    continue
+                if chunk is None:
+                    other.put(None)
+                    continue
+                return chunk
 
     def add_task(self, func: callable, args: tuple = (None,)) -> None:
         """
@@ -68,58 +185,279 @@ class ProcessTester:
             func (Callable): The function to execute.
             args (tuple): The arguments to pass to the function.
         """
-        self.task_queue.put((func, args))
+        self.add_tasks([(func, args)])
+
+    def add_tasks(self, tasks: list[tuple[callable, tuple]]) -> None:
+        """
+        Add tasks to the task queue in chunks, to cut the number of queue round-trips.
+
+        Args:
+            tasks (list): (func, args) pairs of the tasks.
+        """
+        chunk_size = self.chunk_size or max(
+            1, math.ceil(len(tasks) / (4 * max(1, len(self.workers))))
+        )
+        for i in range(0, len(tasks), chunk_size):
+            self.put_chunk(tasks[i : i + chunk_size])
+
+    def put_chunk(self, chunk: list | None) -> None:
+        """Put a chunk into the shared queue, or into the queue of the next worker."""
+        if self.dispatch == "shared":
+            self.task_queue.put(chunk)
+            return
+        self.worker_queues[self.next_worker % len(self.workers)].put(chunk)
+        self.next_worker += 1
+
+    def wait_for_events(self, kind: str, count: int, check_workers: bool = True) -> list:
+        """
+        Wait for count events of a kind from the workers, returning their values.
+
+        Args:
+            kind (str): The kind of the events, "ready", "done" or "exit".
+            count (int): The number of events to wait for.
+            check_workers (bool): Whether to fail on the errors of the tasks, and
+                when a worker process dies. Otherwise dead workers count as exited,
+                as they never report their exit.
+
+        Raises:
+            RuntimeError: If a task raised an exception, or a worker process died.
+        """
+        values = []
+        while len(values) < count:
+            try:
+                event, value = self.event_queue.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                dead = [w for w in self.workers if not w.is_alive()]
+                if check_workers and dead:
+                    raise RuntimeError(
+                        f"Worker process {dead[0].name} died with exit code {dead[0].exitcode}."
+                    )
+                if kind == "exit":
+                    values.extend(w.name for w in dead if w.name not in values)
+                continue
+            if event == kind and not (kind == "exit" and value in values):
+                values.append(value)
+            elif event == "error" and check_workers:
+                name, error = value
+                raise RuntimeError(f"A task failed in worker process {name}:\n{error}")
+        return values
+
+    def wait_for_tasks(self, num_of_tasks: int) -> None:
+        """Wait until the workers have finished num_of_tasks tasks."""
+        while num_of_tasks > 0:
+            num_of_tasks -= sum(self.wait_for_events("done", 1))
+
+    def resize(self, num_of_processes: int) -> float:
+        """
+        Start or stop workers, until there are num_of_processes of them.
+
+        The startup latency of every new worker is appended to worker_startup.
+
+        Returns:
+            float: The number of seconds it took until every new worker got ready,
+            or until every removed worker exited.
+        """
+        start = time.perf_counter()
+        latencies = []
+        if num_of_processes > len(self.workers):
+            new_workers = [
+                self.context.Process(target=self.worker, args=self.worker_args(index))
+                for index in range(len(self.workers), num_of_processes)
+            ]
+            started_at = {}
+            for worker in new_workers:
+                started_at[worker.name] = time.time()
+                worker.start()
+            latencies = [
+                ready_at - started_at[name]
+                for name, ready_at in self.wait_for_events("ready", len(new_workers))
+            ]
+            self.workers.extend(new_workers)
+        elif num_of_processes < len(self.workers):
+            for index in range(num_of_processes, len(self.workers)):
+                if self.dispatch == "shared":
+                    self.task_queue.put(None)
+                else:
+                    self.worker_queues[index].put(None)
+            stopped = set(
+                self.wait_for_events(
+                    "exit", len(self.workers) - num_of_processes, check_workers=False
+                )
+            )
+            for worker in self.workers:
+                if worker.name in stopped:
+                    worker.join()
+            self.workers = [w for w in self.workers if w.name not in stopped]
+        self.worker_startup.append(latencies)
+        return time.perf_counter() - start
+
+    def worker_args(self, index: int) -> tuple:
+        """Returns the arguments of the index-th worker process."""
+        if self.dispatch == "shared":
+            return self.task_queue, self.event_queue
+        steal_from = (
+            [q for i, q in enumerate(self.worker_queues) if i != index]
+            if self.dispatch == "stealing"
+            else []
+        )
+        return self.worker_queues[index], self.event_queue, steal_from
+
+    def shutdown(self) -> None:
+        """Stop every worker process."""
+        self.resize(0)
+
+    def terminate(self) -> None:
+        """Kill every worker process, without waiting for the queued tasks."""
+        for worker in self.workers:
+            worker.terminate()
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
 
     def run(self) -> None:
         """
         Run the ProcessTester.
 
         Go through max_num_of_processes iterations. The n-th iteration will
-        create n processes and run num_of_cores tasks on them. The higher the
+        resize the pool to n processes and run num_of_cores tasks on them. The higher the
         process number, the less time the execution should take. This performance increase
         should start diminishing after process num reaches num_of_cores/2 and completely stop
         after num_of_cores.
+        Only the execution of the tasks is measured, the startup of the new processes
+        is reported separately. Every iteration is measured repeats times.
+
+        Raises:
+            RuntimeError: If a task raised an exception, or a worker process died.
         """
-        for iteration in range(1,self.max_num_of_processes+1):
-            self.workers = [
-            mp.Process(target=self.worker, args=(self.task_queue,))
-            for _ in range(iteration)
-        ]
+        try:
+            for iteration in range(1, self.max_num_of_processes + 1):
+                startup = self.resize(iteration)
+                samples = [self.run_iteration() for _ in range(self.repeats)]
+                self.samples.append(samples)
+                self.results.append(round(summarize(samples)["mean"], 2))
+                self.startup_results.append(round(startup, 2))
+                print(
+                    f"Completed run with {iteration} processes in {self.results[-1]:2f} seconds "
+                    f"(startup took {self.startup_results[-1]:2f} seconds, "
+                    f"{report_startup(self.worker_startup[-1])})."
+                )
+        except BaseException:
+            # The queues may still hold the tasks of the failed iteration
+            self.terminate()
+            raise
+        self.shutdown()
+        print(report(self.mean_times(), self.analyze()))
+        self.create_and_save_plot()
 
-            for worker in self.workers:
-                worker.start()
+    def mean_times(self) -> list[float]:
+        """The unrounded mean execution time of every iteration."""
+        return [summarize(samples)["mean"] for samples in self.samples]
 
-            start = time.perf_counter()
-            for _ in range(self.num_of_cores):
-                self.add_task(bubble_sort, ([random.randint(1,1_000_000) for _ in range(8_000)],))
+    def analyze(self) -> dict:
+        """Returns the speedup, efficiency and Amdahl fit of the run, see scaling.analyze."""
+        return analyze(self.mean_times())
 
-            for _ in range(iteration):
-                self.task_queue.put(None)
+    def run_iteration(self) -> float:
+        """
+        Sort num_of_cores random inputs on the current pool with the workload.
 
-            for worker in self.workers:
-                worker.join()
+        The measured region covers everything that depends on the number of
+        processes: splitting the inputs (e.g. sample sort), placing them into
+        shared memory or pickling them, and sorting them.
 
-            self.results.append(round(time.perf_counter() - start, 2))
-            print(f"Completed run with {iteration} processes in {self.results[-1]:2f} seconds.")
-        self.create_and_save_plot()
+        Returns:
+            float: The number of seconds it took.
+        """
+        inputs = [
+            [random.randint(1, 1_000_000) for _ in range(self.input_size)]
+            for _ in range(self.num_of_cores)
+        ]
+        shared = None
+        start = time.perf_counter()
+        try:
+            if self.workload.split:
+                inputs = self.workload.split(inputs, len(self.workers))
+            if self.payload == "shared":
+                shared = SharedPayload(inputs)
+                tasks = [(self.workload.sort, (handle,)) for handle in shared.slices]
+            else:
+                tasks = [(self.workload.sort, (data,)) for data in inputs]
+
+            self.add_tasks(tasks)
+            self.wait_for_tasks(len(tasks))
+            return time.perf_counter() - start
+        finally:
+            if shared:
+                shared.close()
 
+    def record(self) -> dict:
+        """Returns the environment metadata and the measurements of the run."""
+        return {
+            "metadata": environment_metadata(
+                workload=self.workload.name,
+                input_size=self.input_size,
+                num_of_tasks=self.num_of_cores,
+                payload=self.payload,
+                chunk_size=self.chunk_size,
+                dispatch=self.dispatch,
+                start_method=self.context.get_start_method(),
+                repeats=self.repeats,
+            ),
+            "measurements": [
+                {
+                    "processes": processes,
+                    "startup": startup,
+                    "worker_startup": worker_startup,
+                    "samples": samples,
+                    **summarize(samples),
+                }
+                for processes, (startup, worker_startup, samples) in enumerate(
+                    zip(self.startup_results, self.worker_startup, self.samples), start=1
+                )
+            ],
+            "analysis": self.analyze(),
+        }
 
     def create_and_save_plot(self) -> None:
+        # Imported here, as importing matplotlib is slow, and the worker processes
+        # re-import this module with the spawn and forkserver start methods
+        import matplotlib.pyplot as plt
+
         x_values = list(
         range(1, len(self.results) + 1)
         )
+        analysis = self.analyze()
+        optimal = analysis["optimal_processes"]
+        fig, (time_ax, speedup_ax) = plt.subplots(1, 2, figsize=(12, 5))
 
-        # Create a scatter plot
-        plt.scatter(x_values, self.results)
-        plt.xticks(x_values)
+        # Create a scatter plot of the execution times, marking the optimal worker count
+        time_ax.scatter(x_values, self.results)
+        time_ax.axvline(optimal, color="green", linestyle=":", label=f"Optimal: {optimal}")
+        time_ax.set_xticks(x_values)
+        time_ax.set_xlabel("Number of processes")
+        time_ax.set_ylabel("Execution time (s)")
+        time_ax.set_title("Task Execution Times per number of processes")
+        time_ax.legend()
 
-        # Add labels to the plot
-        plt.xlabel("Number of cores")
-        plt.ylabel("Execution time (s)")
-        plt.title("Task Execution Times per CPU")
+        # Plot the measured speedup against the ideal and the fitted Amdahl curve
+        serial_fraction = analysis["serial_fraction"]
+        speedup_ax.plot(x_values, analysis["speedup"], "o-", label="Measured")
+        speedup_ax.plot(x_values, x_values, "--", color="gray", label="Ideal")
+        speedup_ax.plot(
+            x_values,
+            [amdahl_speedup(p, serial_fraction) for p in x_values],
+            ":",
+            label=f"Amdahl fit (serial fraction {serial_fraction:.1%})",
+        )
+        speedup_ax.set_xticks(x_values)
+        speedup_ax.set_xlabel("Number of processes")
+        speedup_ax.set_ylabel("Speedup")
+        speedup_ax.set_title("Speedup per number of processes")
+        speedup_ax.legend()
 
         # Save it
-        plt.savefig("concurrency/results/scatter_plot.png", dpi=300)
+        fig.tight_layout()
+        fig.savefig("concurrency/results/scatter_plot.png", dpi=300)
 
 
 @time_sync
@@ -130,9 +468,31 @@ def main() -> None:
     It creates and runs a ProcessTester instance to measure the performance of the
     multiprocessing module.
     """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--workload", choices=list(WORKLOADS), default="bubble")
+    parser.add_argument("--input-size", type=int, default=8_000)
+    parser.add_argument("--payload", choices=["pickle", "shared"], default="pickle")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--dispatch", choices=DISPATCH_MODES, default="shared")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    add_start_method_argument(parser)
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    args = parser.parse_args()
+
     cpu_cores = mp.cpu_count()
-    pt = ProcessTester(num_of_cores=cpu_cores, max_num_of_processes=cpu_cores+5)
+    pt = ProcessTester(
+        num_of_cores=cpu_cores,
+        max_num_of_processes=cpu_cores + 5,
+        input_size=args.input_size,
+        payload=args.payload,
+        workload=args.workload,
+        repeats=args.repeats,
+        dispatch=args.dispatch,
+        chunk_size=args.chunk_size,
+        start_method=args.start_method,
+    )
     pt.run()
+    print(f"Results saved to {save_run(pt.record(), args.results_dir)}")
 
     print("Main finished ", end='')
 
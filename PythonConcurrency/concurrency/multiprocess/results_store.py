@@ -0,0 +1,216 @@
+import argparse
+import csv
+import json
+import math
+import multiprocessing as mp
+import os
+import platform
+import statistics
+import sys
+import time
+
+# Default directory the benchmark runs are stored in
+RESULTS_DIR = "concurrency/results/runs"
+# Minimum number of samples of a measurement in both runs for Welch's t-test
+MIN_SAMPLES = 2
+
+
+def environment_metadata(**run_parameters) -> dict:
+    """
+    Returns the description of the current host, extended with run_parameters.
+
+    The global start method is only reported if it has been fixed already, looking it up
+    mustn't fix it. Pass the start_method of the context in use among run_parameters.
+    """
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "python_version": platform.python_version(),
+        "cpu_count": mp.cpu_count(),
+        "start_method": mp.get_start_method(allow_none=True),
+        **run_parameters,
+    }
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """Returns the mean, standard deviation, extremes and percentiles of the samples."""
+    if len(samples) > 1:
+        percentiles = statistics.quantiles(samples, n=100, method="inclusive")
+        p50, p90, p99 = percentiles[49], percentiles[89], percentiles[98]
+    else:
+        p50 = p90 = p99 = samples[0]
+    return {
+        "mean": statistics.fmean(samples),
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "min": min(samples),
+        "max": max(samples),
+        "p50": p50,
+        "p90": p90,
+        "p99": p99,
+    }
+
+
+def save_run(run: dict, results_dir: str = RESULTS_DIR) -> str:
+    """
+    Save a run as JSON, and its raw samples as CSV next to it.
+
+    Args:
+        run (dict): The metadata and measurements of the run, see ProcessTester.record()
+        results_dir (str): The directory to save the run into
+
+    Returns:
+        str: The path of the JSON file.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    metadata = run["metadata"]
+    name = (
+        f"{time.strftime('%Y%m%d-%H%M%S')}_{metadata['hostname']}_{metadata['workload']}"
+    )
+    path = os.path.join(results_dir, f"{name}.json")
+    with open(path, "w") as file:
+        json.dump(run, file, indent=2)
+    with open(os.path.join(results_dir, f"{name}.csv"), "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["processes", "repeat", "seconds", "startup_seconds"])
+        for measurement in run["measurements"]:
+            for repeat, seconds in enumerate(measurement["samples"]):
+                writer.writerow(
+                    [measurement["processes"], repeat, seconds, measurement["startup"]]
+                )
+    return path
+
+
+def load_run(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def incomplete_beta(a: float, b: float, x: float) -> float:
+    """The regularized incomplete beta function, by its continued fraction."""
+    if x <= 0 or x >= 1:
+        return max(0.0, min(1.0, x))
+    if x > (a + 1) / (a + b + 2):
+        return 1 - incomplete_beta(b, a, 1 - x)
+    front = math.exp(
+        math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+        + a * math.log(x) + b * math.log(1 - x)
+    ) / a
+    # Modified Lentz's method
+    tiny = 1e-300
+    c, d = 1.0, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 200):
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1) < 1e-12:
+            break
+    return front * result
+
+
+def welch_t_test(baseline: list[float], candidate: list[float]) -> float:
+    """Returns the two-sided p-value of Welch's t-test of the two samples."""
+    if len(baseline) < MIN_SAMPLES or len(candidate) < MIN_SAMPLES:
+        return math.nan
+    var_b = statistics.variance(baseline) / len(baseline)
+    var_c = statistics.variance(candidate) / len(candidate)
+    if var_b + var_c == 0:
+        return 0.0 if statistics.fmean(baseline) != statistics.fmean(candidate) else 1.0
+    t = (statistics.fmean(candidate) - statistics.fmean(baseline)) / math.sqrt(var_b + var_c)
+    df = (var_b + var_c) ** 2 / (
+        var_b**2 / (len(baseline) - 1) + var_c**2 / (len(candidate) - 1)
+    )
+    return incomplete_beta(df / 2, 0.5, df / (df + t * t))
+
+
+def compare(
+    baseline: dict, candidate: dict, alpha: float = 0.05, threshold: float = 0.05
+) -> list[dict]:
+    """
+    Compare the measurements of two runs with the same number of processes.
+
+    A measurement is a regression if the candidate is slower by more than threshold
+    (relative to the baseline mean), and the difference is statistically significant
+    by Welch's t-test at the alpha level. It needs at least MIN_SAMPLES repeats in
+    both runs, otherwise the measurement is never flagged, see "samples".
+
+    Returns:
+        list[dict]: The comparison of every process count present in both runs.
+    """
+    baseline_by_processes = {m["processes"]: m for m in baseline["measurements"]}
+    comparisons = []
+    for measurement in candidate["measurements"]:
+        base = baseline_by_processes.get(measurement["processes"])
+        if base is None:
+            continue
+        change = measurement["mean"] / base["mean"] - 1 if base["mean"] else math.nan
+        p_value = welch_t_test(base["samples"], measurement["samples"])
+        comparisons.append(
+            {
+                "processes": measurement["processes"],
+                "baseline_mean": base["mean"],
+                "candidate_mean": measurement["mean"],
+                "change": change,
+                "p_value": p_value,
+                # The number of samples of the smaller run
+                "samples": min(len(base["samples"]), len(measurement["samples"])),
+                "regression": change > threshold and p_value < alpha,
+                "improvement": change < -threshold and p_value < alpha,
+            }
+        )
+    return comparisons
+
+
+def main() -> None:
+    """
+    Compare two stored ProcessTester runs, flagging the significant regressions.
+
+    Exits with status 1 if there is any regression, and with status 2 if a run has
+    fewer than MIN_SAMPLES repeats, as then no regression can be detected.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compare_parser = subparsers.add_parser("compare", help="Compare two stored runs.")
+    compare_parser.add_argument("baseline", help="JSON file of the baseline run.")
+    compare_parser.add_argument("candidate", help="JSON file of the candidate run.")
+    compare_parser.add_argument("--alpha", type=float, default=0.05)
+    compare_parser.add_argument("--threshold", type=float, default=0.05)
+    args = parser.parse_args()
+
+    baseline, candidate = load_run(args.baseline), load_run(args.candidate)
+    for key in ("hostname", "cpu_count", "workload", "input_size", "start_method"):
+        if baseline["metadata"].get(key) != candidate["metadata"].get(key):
+            print(
+                f"Warning: {key} differs: {baseline['metadata'].get(key)} vs "
+                f"{candidate['metadata'].get(key)}"
+            )
+
+    comparisons = compare(baseline, candidate, args.alpha, args.threshold)
+    print(f"{'processes':>10} {'baseline':>10} {'candidate':>10} {'change':>8} {'p':>8}")
+    for c in comparisons:
+        verdict = "REGRESSION" if c["regression"] else "improved" if c["improvement"] else ""
+        print(
+            f"{c['processes']:>10} {c['baseline_mean']:10.3f} {c['candidate_mean']:10.3f} "
+            f"{c['change']:+8.1%} {c['p_value']:8.3f} {verdict}"
+        )
+    if any(c["regression"] for c in comparisons):
+        raise SystemExit(1)
+    if too_few := [c["processes"] for c in comparisons if c["samples"] < MIN_SAMPLES]:
+        print(
+            f"Error: the runs need at least {MIN_SAMPLES} repeats to be compared, "
+            f"processes {too_few} have fewer. Run ProcessTester with --repeats.",
+            file=sys.stderr,
+        )
+        raise SystemExit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+def speedup(times: list[float]) -> list[float]:
+    """Speedup of every process count p: T(1) / T(p)."""
+    return [times[0] / t if t else float("inf") for t in times]
+
+
+def efficiency(times: list[float]) -> list[float]:
+    """Parallel efficiency of every process count p: speedup / p."""
+    return [s / p for p, s in enumerate(speedup(times), start=1)]
+
+
+def karp_flatt(times: list[float]) -> list[float | None]:
+    """
+    The experimentally determined serial fraction (Karp-Flatt metric) of every
+    process count, None for a single process.
+    """
+    return [None] + [
+        (1 / s - 1 / p) / (1 - 1 / p) if s else None
+        for p, s in enumerate(speedup(times)[1:], start=2)
+    ]
+
+
+def fit_amdahl(times: list[float]) -> tuple[float, float]:
+    """
+    Fit Amdahl's law, T(p) = T1 * (f + (1 - f) / p), on the measured times.
+
+    It is a least squares fit of T(p) = a + b / p, where a is the serial and b
+    the parallelizable part of the work.
+
+    Returns:
+        tuple[float, float]: The serial fraction f (clamped to [0, 1]) and the
+        fitted single process time T1.
+    """
+    xs = [1 / p for p in range(1, len(times) + 1)]
+    if len(times) < 2:
+        return 0.0, times[0]
+    mean_x = sum(xs) / len(xs)
+    mean_t = sum(times) / len(times)
+    b = sum((x - mean_x) * (t - mean_t) for x, t in zip(xs, times)) / sum(
+        (x - mean_x) ** 2 for x in xs
+    )
+    a = mean_t - b * mean_x
+    t1 = a + b
+    serial_fraction = min(1.0, max(0.0, a / t1)) if t1 > 0 else 1.0
+    return serial_fraction, t1
+
+
+def amdahl_speedup(processes: int, serial_fraction: float) -> float:
+    """Speedup predicted by Amdahl's law for a fixed problem size."""
+    return 1 / (serial_fraction + (1 - serial_fraction) / processes)
+
+
+def gustafson_speedup(processes: int, serial_fraction: float) -> float:
+    """Scaled speedup predicted by Gustafson's law, if the problem grows with processes."""
+    return processes - serial_fraction * (processes - 1)
+
+
+def diminishing_returns(times: list[float], min_gain: float = 0.05) -> int:
+    """
+    Returns the first process count after which adding a process makes the
+    execution less than min_gain (relatively) faster.
+    """
+    for p in range(1, len(times)):
+        if times[p] <= 0 or times[p - 1] / times[p] < 1 + min_gain:
+            return p
+    return len(times)
+
+
+def optimal_processes(times: list[float], tolerance: float = 0.05) -> int:
+    """Returns the smallest process count whose time is within tolerance of the best one."""
+    best = min(times)
+    return next(p for p, t in enumerate(times, start=1) if t <= best * (1 + tolerance))
+
+
+def analyze(times: list[float]) -> dict:
+    """Returns every scaling metric of the series of times measured with 1..n processes."""
+    serial_fraction, t1 = fit_amdahl(times)
+    return {
+        "speedup": speedup(times),
+        "efficiency": efficiency(times),
+        "karp_flatt": karp_flatt(times),
+        "serial_fraction": serial_fraction,
+        "fitted_single_process_time": t1,
+        "max_amdahl_speedup": 1 / serial_fraction if serial_fraction else float("inf"),
+        "diminishing_returns": diminishing_returns(times),
+        "optimal_processes": optimal_processes(times),
+    }
+
+
+def report(times: list[float], analysis: dict) -> str:
+    """Returns a human readable table and summary of the analysis."""
+    lines = [f"{'processes':>10} {'time (s)':>10} {'speedup':>8} {'efficiency':>11} {'karp-flatt':>11}"]
+    for p, (t, s, e, kf) in enumerate(
+        zip(times, analysis["speedup"], analysis["efficiency"], analysis["karp_flatt"]),
+        start=1,
+    ):
+        karp_flatt_value = f"{kf:11.3f}" if kf is not None else f"{'-':>11}"
+        lines.append(f"{p:>10} {t:10.2f} {s:8.2f} {e:11.1%} {karp_flatt_value}")
+    f = analysis["serial_fraction"]
+    lines.append(
+        f"Amdahl fit: serial fraction {f:.1%}, max speedup {analysis['max_amdahl_speedup']:.1f}x, "
+        f"Gustafson scaled speedup at {len(times)} processes "
+        f"{gustafson_speedup(len(times), f):.1f}x."
+    )
+    lines.append(
+        f"Returns diminish after {analysis['diminishing_returns']} processes, "
+        f"optimal worker count: {analysis['optimal_processes']}."
+    )
+    return "\n".join(lines)
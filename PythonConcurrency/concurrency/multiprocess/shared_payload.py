@@ -0,0 +1,110 @@
+import sys
+from array import array
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+
+
+@dataclass(frozen=True)
+class SharedSlice:
+    """
+    A handle of a typed slice of a shared memory block.
+
+    Only this handle is pickled and sent to the worker processes, which attach
+    to the block and work on the data in place.
+    """
+
+    name: str
+    offset: int
+    length: int
+    typecode: str = "i"
+
+
+class SharedPayload:
+    """
+    The inputs of a batch of tasks, placed into a single shared memory block.
+
+    The block is created, and destroyed by close(), in the parent process.
+    """
+
+    # The shared memory block holding every input
+    block: SharedMemory
+    # The handle of every input, in the original order
+    slices: list[SharedSlice]
+    # The typecode of the items, see the array module
+    typecode: str
+
+    def __init__(self, inputs: list[list[int]], typecode: str = "i") -> None:
+        """
+        Copy the inputs into a new shared memory block.
+
+        Args:
+            inputs (list): The input list of every task.
+            typecode (str): The typecode of the items, see the array module.
+        """
+        self.typecode = typecode
+        itemsize = array(typecode).itemsize
+        self.block = SharedMemory(
+            create=True, size=max(1, sum(map(len, inputs))) * itemsize
+        )
+        self.slices = []
+        offset = 0
+        with self.block.buf.cast(typecode) as view:
+            for data in inputs:
+                view[offset : offset + len(data)] = array(typecode, data)
+                self.slices.append(
+                    SharedSlice(self.block.name, offset, len(data), typecode)
+                )
+                offset += len(data)
+
+    def __enter__(self) -> "SharedPayload":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def read(self, index: int) -> list[int]:
+        """Returns a copy of the (possibly already processed) input of a task."""
+        shared_slice = self.slices[index]
+        with self.block.buf.cast(self.typecode) as view:
+            return view[
+                shared_slice.offset : shared_slice.offset + shared_slice.length
+            ].tolist()
+
+    def close(self) -> None:
+        """Close and destroy the shared memory block."""
+        self.block.close()
+        self.block.unlink()
+
+
+def attach(name: str) -> SharedMemory:
+    """
+    Attach to an existing shared memory block, without taking ownership of it.
+
+    Before Python 3.13 attaching registers the block with the resource tracker
+    again, which is harmless here, as the workers share the tracker of the
+    parent process, which unregisters the block when it destroys it.
+    """
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name, track=False)
+    return SharedMemory(name)
+
+
+@contextmanager
+def resolve(args: tuple):
+    """
+    Replace the SharedSlice handles among args with memoryviews of their data.
+
+    The memoryviews are writable, so the tasks can write their results in place.
+    The blocks are detached again when the context exits.
+    """
+    with ExitStack() as stack:
+        resolved = []
+        for arg in args:
+            if isinstance(arg, SharedSlice):
+                block = attach(arg.name)
+                stack.callback(block.close)
+                view = stack.enter_context(block.buf.cast(arg.typecode))
+                arg = stack.enter_context(view[arg.offset : arg.offset + arg.length])
+            resolved.append(arg)
+        yield tuple(resolved)
@@ -0,0 +1,75 @@
+import argparse
+import multiprocessing as mp
+import time
+from multiprocessing.context import BaseContext
+
+# The start methods the entry points can be run with, the default is the platform's one
+START_METHODS = ("fork", "spawn", "forkserver")
+# Modules the forkserver imports once, so the processes forked from it don't import them
+PRELOAD_MODULES = ["concurrency.functions"]
+
+
+def get_context(method: str = None, preload: list[str] = PRELOAD_MODULES) -> BaseContext:
+    """
+    Returns the multiprocessing context of a start method.
+
+    Args:
+        method (str): One of START_METHODS, the platform default if None.
+        preload (list): Modules the forkserver preloads, if the method is forkserver.
+    """
+    context = mp.get_context(method)
+    if context.get_start_method() == "forkserver":
+        context.set_forkserver_preload(preload)
+    return context
+
+
+def add_start_method_argument(parser: argparse.ArgumentParser) -> None:
+    """Add the --start-method option to the parser of an entry point."""
+    parser.add_argument(
+        "--start-method",
+        choices=[m for m in START_METHODS if m in mp.get_all_start_methods()],
+        default=None,
+        help="The multiprocessing start method, the platform default if not set.",
+    )
+
+
+def timed_target(startup_cn: mp.Queue, target: callable, *args) -> None:
+    """Process target reporting the time the process got ready, before running target."""
+    startup_cn.put((mp.current_process().name, time.time()))
+    target(*args)
+
+
+def start_processes(
+    context: BaseContext, targets: list[tuple[callable, tuple]]
+) -> tuple[list[mp.Process], dict[str, float]]:
+    """
+    Start a process for every (target, args) pair, and wait until each of them is ready.
+
+    Returns:
+        tuple[list, dict]: The started processes, and the number of seconds it took
+        from starting every process until it got ready to run its target, by name.
+    """
+    startup_cn = context.Queue()
+    processes = [
+        context.Process(target=timed_target, args=(startup_cn, target, *args))
+        for target, args in targets
+    ]
+    started_at = {}
+    for p in processes:
+        started_at[p.name] = time.time()
+        p.start()
+    latencies = {}
+    for _ in processes:
+        name, ready_at = startup_cn.get()
+        latencies[name] = ready_at - started_at[name]
+    return processes, latencies
+
+
+def report_startup(latencies: list[float]) -> str:
+    """Returns the summary of the startup latencies of the worker processes."""
+    if not latencies:
+        return "no worker started"
+    return (
+        f"{len(latencies)} worker(s) started in {sum(latencies) / len(latencies):.4f} "
+        f"seconds on average, the slowest in {max(latencies):.4f} seconds"
+    )
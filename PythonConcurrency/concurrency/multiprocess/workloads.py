@@ -0,0 +1,131 @@
+import bisect
+import random
+from array import array
+from dataclasses import dataclass
+
+from concurrency.functions import time_sync
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the numpy workload is only registered if it is installed
+    np = None
+
+
+def write_back(lst, values) -> None:
+    """Write the sorted values back into lst, which is either a list or a memoryview."""
+    if isinstance(lst, list):
+        lst[:] = values
+    else:
+        lst[:] = array(lst.format, values)
+
+
+@time_sync
+def bubble_sort(lst):
+    """Bubble Sort algorithm.
+
+    A really simple implementation of the bubble sort algorithm to utilize the CPU.
+    It repeatedly compares adjacent elements and swaps them if they are out of order.
+    """
+    n = len(lst)
+    for i in range(n):
+        swapped = False
+        for j in range(
+            0, n - i - 1
+        ):
+            if lst[j] > lst[j + 1]:
+                lst[j], lst[j + 1] = lst[j + 1], lst[j]
+                swapped = True
+        if not swapped:
+            break
+    print(f"Sorted array ", end="")
+
+
+@time_sync
+def merge_sort(lst):
+    """Merge Sort algorithm.
+
+    A pure Python, bottom-up implementation of merge sort, the O(n log n)
+    baseline of the interpreted sorting algorithms.
+    """
+    values = list(lst)
+    width = 1
+    while width < len(values):
+        merged = []
+        for start in range(0, len(values), 2 * width):
+            left = values[start : start + width]
+            right = values[start + width : start + 2 * width]
+            i = j = 0
+            while i < len(left) and j < len(right):
+                if left[i] <= right[j]:
+                    merged.append(left[i])
+                    i += 1
+                else:
+                    merged.append(right[j])
+                    j += 1
+            merged.extend(left[i:])
+            merged.extend(right[j:])
+        values = merged
+        width *= 2
+    write_back(lst, values)
+    print(f"Sorted array ", end="")
+
+
+@time_sync
+def timsort(lst):
+    """Python's built-in Timsort, implemented in C."""
+    write_back(lst, sorted(lst))
+    print(f"Sorted array ", end="")
+
+
+@time_sync
+def numpy_sort(lst):
+    """NumPy's vectorized sort, sorting shared memory in place without copying it."""
+    if isinstance(lst, list):
+        lst[:] = np.sort(np.array(lst)).tolist()
+    else:
+        np.asarray(lst).sort()
+    print(f"Sorted array ", end="")
+
+
+def sample_sort_split(inputs: list[list[int]], num_of_buckets: int) -> list[list[int]]:
+    """
+    The partitioning step of sample sort.
+
+    The inputs are treated as one large array, which is split into num_of_buckets
+    buckets by splitters picked from a random sample, so that every item of a bucket
+    is smaller than every item of the next bucket. Sorting the buckets in parallel
+    and concatenating them sorts the whole array.
+    """
+    values = [item for data in inputs for item in data]
+    oversampling = 16
+    sample = sorted(
+        random.sample(values, min(len(values), num_of_buckets * oversampling))
+    )
+    splitters = sample[oversampling::oversampling][: num_of_buckets - 1]
+    buckets = [[] for _ in range(len(splitters) + 1)]
+    for item in values:
+        buckets[bisect.bisect_right(splitters, item)].append(item)
+    return buckets
+
+
+@dataclass(frozen=True)
+class Workload:
+    """A sorting engine ProcessTester can be run with."""
+
+    name: str
+    # Sorts a single task input in place
+    sort: callable
+    # Turns the inputs into the task inputs for a number of processes, if set.
+    # Without it, every input is a separate task.
+    split: callable = None
+
+
+# Every workload ProcessTester can run, by name
+WORKLOADS: dict[str, Workload] = {
+    "bubble": Workload("bubble", bubble_sort),
+    "merge": Workload("merge", merge_sort),
+    "timsort": Workload("timsort", timsort),
+    "sample": Workload("sample", timsort, split=sample_sort_split),
+}
+if np is not None:
+    WORKLOADS["numpy"] = Workload("numpy", numpy_sort)
@@ -0,0 +1,15 @@
+import os
+
+# Prefix of the environment variables overriding the parameters of the demos
+ENV_PREFIX = "CONCURRENCY_"
+
+
+def env_param(name: str, default, cast: type = int):
+    """
+    Returns the value of a demo parameter, overridden by the CONCURRENCY_<name> variable.
+
+    It lets the benchmark runner change the task counts and durations of the demos,
+    which are run in their own processes.
+    """
+    value = os.environ.get(ENV_PREFIX + name)
+    return cast(value) if value else default
@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    A thread-safe, size-bounded LRU cache, whose entries expire after ttl seconds.
+    """
+
+    # Maximum number of entries, the least recently used one is evicted above it
+    max_entries: int
+    # Number of seconds an entry stays valid, never expires if None
+    ttl: float | None
+    # Dictionary mapping the keys to their (expiry time, value) pair, oldest first
+    entries: OrderedDict[str, tuple[float, object]]
+    # A lock for synchronizing access to the entries
+    lock: threading.Lock
+
+    def __init__(self, max_entries: int, ttl: float = None) -> None:
+        """
+        Initialize the ResultCache.
+
+        Args:
+            max_entries (int): Maximum number of entries, 0 disables the cache
+            ttl (float): Number of seconds an entry stays valid, never expires if None
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.entries)
+
+    def get(self, key: str) -> tuple[bool, object]:
+        """
+        Look up a key.
+
+        Returns:
+            tuple[bool, object]: Whether the key was found, and its value.
+        """
+        with self.lock:
+            if key not in self.entries:
+                return False, None
+            expires_at, value = self.entries[key]
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+            return True, value
+
+    def put(self, key: str, value: object) -> None:
+        if not self.max_entries:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
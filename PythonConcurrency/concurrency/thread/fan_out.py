@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import contextlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from concurrency.functions import (
+    IO_SECONDS,
+    N_TH_FIBO,
+    example_task,
+    other_example_task,
+    time_sync,
+)
+from concurrency.kernels import get_kernel
+
+# The ways the tasks can be run concurrently
+MODES = ("threads", "pool", "asyncio")
+# Default numbers of concurrent tasks of the sweep, by workload
+SIZES = {"io": (1, 10, 100, 1_000, 5_000), "cpu": (1, 2, 4, 8)}
+# Default number of threads of the bounded pool
+POOL_SIZE = 100
+
+
+def rss_bytes() -> int:
+    """Returns the current resident set size of the process, 0 if it is unknown."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:  # Not on Linux
+        return 0
+
+
+async def example_task_async(desc: str = None):
+    """The asyncio counterpart of example_task, awaiting instead of blocking."""
+    await asyncio.sleep(IO_SECONDS)
+
+
+async def other_example_task_async(desc: str = None):
+    """The asyncio counterpart of other_example_task, it blocks the event loop."""
+    get_kernel().fibonacci(N_TH_FIBO)
+
+
+def run_threads(task: callable, num_of_tasks: int) -> tuple[float, int]:
+    """Run every task on its own thread, see fan_out."""
+    start = time.perf_counter()
+    threads = [threading.Thread(target=task) for _ in range(num_of_tasks)]
+    for thread in threads:
+        thread.start()
+    created, rss = time.perf_counter() - start, rss_bytes()
+    for thread in threads:
+        thread.join()
+    return created, rss
+
+
+def run_pool(task: callable, num_of_tasks: int, pool_size: int) -> tuple[float, int]:
+    """Run the tasks on a bounded thread pool, see fan_out."""
+    with ThreadPoolExecutor(max_workers=pool_size) as pool:
+        start = time.perf_counter()
+        futures = [pool.submit(task) for _ in range(num_of_tasks)]
+        created, rss = time.perf_counter() - start, rss_bytes()
+        wait(futures)
+    return created, rss
+
+
+async def run_asyncio(coroutine: callable, num_of_tasks: int) -> tuple[float, int]:
+    """Run every coroutine as its own asyncio task, see fan_out."""
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(coroutine()) for _ in range(num_of_tasks)]
+    created, rss = time.perf_counter() - start, rss_bytes()
+    await asyncio.gather(*tasks)
+    return created, rss
+
+
+def fan_out(mode: str, workload: str, num_of_tasks: int, pool_size: int) -> dict:
+    """
+    Run num_of_tasks example tasks concurrently, and measure what it cost.
+
+    Args:
+        mode (str): One of MODES.
+        workload (str): "io" runs example_task, "cpu" runs other_example_task.
+        num_of_tasks (int): Number of tasks run concurrently.
+        pool_size (int): Number of threads of the pool mode.
+
+    Returns:
+        dict: The creation time per task, the memory per task, measured right after
+        every task is created, and the time it took every task to complete.
+    """
+    task = example_task if workload == "io" else other_example_task
+    coroutine = example_task_async if workload == "io" else other_example_task_async
+    baseline = rss_bytes()
+    start = time.perf_counter()
+    # The tasks print their progress, which would dominate the measurement
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if mode == "threads":
+            created, rss = run_threads(task, num_of_tasks)
+        elif mode == "pool":
+            created, rss = run_pool(task, num_of_tasks, pool_size)
+        else:
+            created, rss = asyncio.run(run_asyncio(coroutine, num_of_tasks))
+    return {
+        "mode": mode,
+        "tasks": num_of_tasks,
+        "creation_per_task": created / num_of_tasks,
+        "memory_per_task": max(0, rss - baseline) / num_of_tasks,
+        "completion": time.perf_counter() - start,
+    }
+
+
+@time_sync
+def main() -> None:
+    """
+    Sweep the number of concurrent example tasks, run on raw threads, on a bounded
+    thread pool and as asyncio tasks.
+
+    It shows where OS threads stop scaling for the I/O bound tasks, and how the GIL
+    serializes the CPU bound ones. Use the CONCURRENCY_IO_SECONDS and
+    CONCURRENCY_FIBO_N variables to change the length of the tasks.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--workload", choices=["io", "cpu"], default="io")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--sizes", type=int, nargs="+")
+    parser.add_argument("--pool-size", type=int, default=POOL_SIZE)
+    args = parser.parse_args()
+
+    print(
+        f"{'mode':>8} {'tasks':>6} {'create (us/task)':>17} {'KiB/task':>9} "
+        f"{'completion (s)':>15}"
+    )
+    for num_of_tasks in args.sizes or SIZES[args.workload]:
+        for mode in args.modes:
+            r = fan_out(mode, args.workload, num_of_tasks, args.pool_size)
+            print(
+                f"{r['mode']:>8} {r['tasks']:>6} {r['creation_per_task'] * 1e6:17.1f} "
+                f"{r['memory_per_task'] / 1024:9.1f} {r['completion']:15.2f}"
+            )
+
+    print("Main finished ", end="")
+
+
+if __name__ == "__main__":
+    main()
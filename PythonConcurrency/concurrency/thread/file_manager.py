@@ -1,191 +1,803 @@
+import queue
 import threading
 import random
 import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, CancelledError, Future, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import partial, wraps
+from itertools import islice
 from logging import Logger, basicConfig, getLogger
 
 from concurrency.functions import time_sync
+from concurrency.thread.cache import ResultCache
+from concurrency.thread.limiter import AIMDLimiter, ConcurrencyLimiter, FixedLimiter
+from concurrency.thread.lock_table import FileLockTable
+from concurrency.thread.saved_file_index import SavedFileIndex
+from concurrency.thread.scheduler import DeadlineExceeded, ScheduledTask, TaskScheduler
+from concurrency.thread.storage import SimulatedBackend, StorageBackend
 
 basicConfig(level="INFO")
 
 
+@dataclass
+class SharedDownload:
+    """A download of a file, shared by every caller downloading the file meanwhile."""
+
+    # Resolved with the result of the download itself
+    future: Future = field(default_factory=Future)
+    # The own Future of every caller waiting for the download, with the
+    # time.monotonic() value the download has to be started by for them (or None)
+    waiters: list[tuple[Future, float | None]] = field(default_factory=list)
+
+
 class FileManager:
     """
     A class to manage file operations in a controlled manner, allowing only
     a specified number of paralel operations.
 
     Note:
-        The current implementation uses locks and relies on the caller to create the threads to
-        manage concurrency for demonstration purposes. In a production environment,
-        a more efficient approach would involve encapsulating the worker processes into FileManager
-        itself and using a task queue with a fixed number of worker threads.
+        FileManager owns a fixed pool of max_file_process worker threads, fed by a
+        bounded task queue. Operations are handed over with submit(), which returns a
+        Future, and blocks the caller when the queue is full (backpressure). This caps
+        the number of OS threads and the memory used by pending operations.
+        The queue hands out the operations by a scheduling policy (see TaskScheduler),
+        operations which missed their deadline are rejected without running them.
+        A worker takes a place within the concurrency limit before it takes the next
+        operation, so the operations are started in the order of the policy even
+        while the limit is below the number of workers.
+        The operations can still be called directly, in which case guard_process keeps
+        them within the current concurrency limit. The limit is max_file_process by
+        default, an adaptive limiter can tune it at runtime between its floor and
+        max_file_process, from the observed latency of the operations.
     """
 
-    # Maximum number of concurrent file tasks
+    # Maximum number of concurrent file tasks, the number of worker threads
     max_file_process: int
-    # A list to keep track of saved files
-    saved_files: list[str]
+    # Decides the current concurrency limit, which never exceeds max_file_process
+    limiter: ConcurrencyLimiter
+    # A sharded index to keep track of saved files
+    saved_files: SavedFileIndex
     # Number of currently running processes
     current_processes: int
-    # A lock for synchronizing access to shared resources (saved_files, file_locks)
+    # Marks the threads which hold a place within the concurrency limit already,
+    # i.e. the workers while they run an operation
+    slot_holders: threading.local
+    # A lock for synchronizing access to shared resources (current_processes,
+    # downloads_in_flight, cache_stats)
     lock: threading.Lock
     # A condition variable for managing state changes
     condition: threading.Condition
-    # Dictionary to maintain individual locks for each file
-    file_locks: dict[str, threading.Lock]
+    # Reader-writer locks for each file, evicted when no longer in use
+    file_locks: FileLockTable
     # Logger object
     logger: Logger
-
-    def __init__(self, max_file_process: int, logger: Logger) -> None:
+    # The storage backend the operations are run on
+    backend: StorageBackend
+    # Bounded queue of pending operations, None signals the workers to stop
+    task_queue: TaskScheduler
+    # The worker threads executing the queued operations
+    workers: list[threading.Thread]
+    # Results of the completed downloads
+    download_cache: ResultCache
+    # The running downloads, concurrent downloads of a file share them
+    downloads_in_flight: dict[str, SharedDownload]
+    # Number of download cache hits, misses and downloads joining a running one
+    cache_stats: dict[str, int]
+    # Whether shutdown() was called, no operation can be submitted after it
+    is_shutdown: bool
+    # Number of submissions currently queueing their operations
+    pending_submissions: int
+    # Notified when the last pending submission has queued its operations
+    submissions_finished: threading.Condition
+
+    def __init__(
+        self,
+        max_file_process: int,
+        logger: Logger,
+        max_queue_size: int = None,
+        backend: StorageBackend = None,
+        policy: str = "fifo",
+        limiter: ConcurrencyLimiter = None,
+        cache_size: int = 1024,
+        cache_ttl: float = 300,
+    ) -> None:
         """
         Initialize the FileManager with max_file_process.
 
         FileManager only allows max_file_process number of parallel tasks, so
         it is vital to set it to a value that works correctly in your system.
+        It starts max_file_process worker threads right away, call shutdown()
+        (or use FileManager as a context manager) to stop them.
 
         Args:
             max_file_process (int): Maximum number of parralel file tasks.
             logger (Logger): The main logger object
+            max_queue_size (int): Maximum number of pending operations, submit()
+                blocks when it is reached. Defaults to 2 * max_file_process.
+            backend (StorageBackend): The storage backend the operations are run on.
+                Defaults to SimulatedBackend, which only sleeps est seconds.
+            policy (str): The scheduling policy of the task queue, one of
+                "fifo", "priority", "deadline" (earliest deadline first) and
+                "sjf" (shortest estimated job first).
+            limiter (ConcurrencyLimiter): Adapts the concurrency limit at runtime,
+                e.g. AIMDLimiter. Defaults to a fixed limit of max_file_process.
+            cache_size (int): Maximum number of cached download results, 0 disables
+                the cache. Concurrent downloads of a file are always coalesced.
+            cache_ttl (float): Number of seconds a download result stays cached.
         """
         self.max_file_process = max_file_process
+        self.limiter = limiter if limiter else FixedLimiter(max_file_process)
         self.logger = logger
-        self.condition.wait()
-        self.saved_files = []
+        self.backend = backend if backend else SimulatedBackend()
+        self.saved_files = SavedFileIndex()
         self.current_processes = 0
+        self.slot_holders = threading.local()
         self.lock = threading.Lock()
         self.condition = threading.Condition(self.lock)
-        self.file_locks = {}
+        self.file_locks = FileLockTable()
+        self.download_cache = ResultCache(cache_size, cache_ttl)
+        self.downloads_in_flight = {}
+        self.cache_stats = {"hits": 0, "misses": 0, "coalesced": 0}
+        self.is_shutdown = False
+        self.pending_submissions = 0
+        self.submissions_finished = threading.Condition(self.lock)
+        self.task_queue = TaskScheduler(
+            max_queue_size if max_queue_size else 2 * max_file_process, policy
+        )
+        self.workers = [
+            threading.Thread(
+                target=self.worker, name=f"FileManager-worker-{i}", daemon=True
+            )
+            for i in range(max_file_process)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def __enter__(self) -> "FileManager":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    def worker(self) -> None:
+        """
+        Worker thread executing the operations from the task queue.
 
-    def get_file_lock(self, file_path: str) -> threading.Lock:
+        The worker waits for a place within the concurrency limit before it takes the
+        next operation, so it always runs the one the policy picks at that moment.
+        The result (or exception) of every operation is set on its Future. Operations
+        which weren't started before their deadline fail with DeadlineExceeded.
+        """
+        while True:
+            self.task_queue.wait()
+            self.acquire_slot()
+            try:
+                task = self.task_queue.get(block=False)
+            except queue.Empty:
+                # Another worker took the operation while this one was waiting
+                self.release_slot()
+                continue
+            if task is None:
+                self.release_slot()
+                break
+            self.slot_holders.held = True
+            try:
+                self.run_task(task)
+            finally:
+                self.slot_holders.held = False
+                self.release_slot()
+        self.logger.debug(f"Worker {threading.current_thread().name} finished.")
+
+    def run_task(self, task: ScheduledTask) -> None:
+        """Run a queued operation, setting its result on its Future."""
+        if not task.future.set_running_or_notify_cancel():
+            return
+        if task.operation == self.fetch_file:
+            # The callers sharing a download have their own deadlines
+            if not self.start_download(task.file_path, task.future):
+                task.future.set_exception(
+                    CancelledError(f"Nobody waits for the download of {task.file_path}.")
+                )
+                return
+        elif task.expired():
+            self.logger.warning(
+                f"Rejecting {task.operation.__name__} of {task.file_path}, its deadline has passed."
+            )
+            task.future.set_exception(
+                DeadlineExceeded(
+                    f"{task.operation.__name__} of {task.file_path} missed its deadline."
+                )
+            )
+            return
+        try:
+            result = task.operation(task.file_path, task.est)
+        except BaseException as exc:
+            task.future.set_exception(exc)
+        else:
+            task.future.set_result(result)
+
+    def submit(
+        self,
+        operation: callable,
+        file_path: str,
+        est: int,
+        priority: int = 0,
+        deadline: float = None,
+        timeout: float = None,
+    ) -> Future:
         """
-        Returns the look of a specified file.
+        Queue a file operation to be run by one of the worker threads.
+
+        If the task queue is full, the caller is blocked until a worker frees
+        up a place (backpressure).
 
-        It safely retrieves the lock for a file. If the file lock doesn't exist,
-        the function first creates it.
+        Args:
+            operation (Callable): One of the file operations, e.g. self.download_file
+            file_path (str): Path of the file to run the operation on
+            est (int): The number of seconds the simulated operation will take
+            priority (int): Operations with higher priority go first with the
+                "priority" policy
+            deadline (float): Number of seconds from now the operation has to be
+                started within, no deadline if None
+            timeout (float): Maximum number of seconds to wait for a free place
+                in the queue, waits forever if None.
+
+        Raises:
+            queue.Full: If no place was freed up in the queue within timeout.
+            RuntimeError: If the FileManager has been shut down.
+        """
+        with self.submitting():
+            deadline = time.monotonic() + deadline if deadline is not None else None
+            if operation == self.download_file:
+                # Downloads served from the cache or from a running download of the
+                # same file don't need a worker at all
+                future, shared = self.claim_download(file_path, deadline)
+                if shared is None:
+                    return future
+                operation, task_future = self.fetch_file, shared.future
+            else:
+                future = task_future = Future()
+            task = ScheduledTask(
+                task_future,
+                operation,
+                file_path,
+                est,
+                priority=priority,
+                deadline=deadline,
+            )
+            try:
+                self.task_queue.put(task, timeout=timeout)
+            except BaseException as exc:
+                task_future.set_exception(exc)
+                raise
+            return future
+
+    def submit_many(
+        self, operations: Iterable[tuple[callable, str, int]], timeout: float = None
+    ) -> list[Future]:
+        """
+        Queue a batch of file operations.
+
+        The operations are grouped by file path, and every group is queued as a
+        single task, which takes a worker and the file lock only once, and runs the
+        operations of the group back to back in their original order.
+        The downloads of a group are only claimed when the group is queued, so if
+        queueing fails, the groups after it leave no download in flight behind.
+        The downloads following a write in their group are always run by the group
+        itself, without the cache or joining another download of the file.
+
+        Args:
+            operations (Iterable): (operation, file_path, est) tuples, where operation is
+                one of download_file, check_saved_file and write_file
+            timeout (float): Maximum number of seconds to wait for a free place
+                in the queue for each group, waits forever if None.
+
+        Returns:
+            list[Future]: The Future of every operation, in the order of operations.
+
+        Raises:
+            queue.Full: If no place was freed up in the queue within timeout.
+            RuntimeError: If the FileManager has been shut down.
+        """
+        with self.submitting():
+            # (index, operation, est) of the operations of every file path
+            groups: dict[str, list[tuple[int, callable, int]]] = {}
+            for index, (operation, file_path, est) in enumerate(operations):
+                if operation not in (
+                    self.download_file,
+                    self.check_saved_file,
+                    self.write_file,
+                ):
+                    raise ValueError(f"{operation} is not a FileManager operation.")
+                groups.setdefault(file_path, []).append((index, operation, est))
+
+            futures: list[Future] = [None] * sum(map(len, groups.values()))
+            for file_path, group in groups.items():
+                batch: list[tuple[callable, int, Future]] = []
+                written = False
+                for index, operation, est in group:
+                    if operation == self.download_file and not written:
+                        futures[index], shared = self.claim_download(file_path)
+                        if shared is not None:
+                            batch.append((self.fetch_file, est, shared.future))
+                        continue
+                    # A download after a write of the group has to see the written
+                    # file, neither the cache nor a running download is up to date
+                    if operation == self.download_file:
+                        operation = self.fetch_file
+                    written = written or operation == self.write_file
+                    futures[index] = Future()
+                    batch.append((operation, est, futures[index]))
+                if not batch:
+                    continue
+                task = ScheduledTask(
+                    Future(),
+                    partial(self.run_batch, batch=batch),
+                    file_path,
+                    sum(est for _, est, _ in batch),
+                )
+                try:
+                    self.task_queue.put(task, timeout=timeout)
+                except BaseException as exc:
+                    for _, _, future in batch:
+                        future.set_exception(exc)
+                    raise
+            return futures
+
+    @contextmanager
+    def submitting(self):  # -> Generator[None]
+        """
+        Context of a submission, which shutdown() waits for before it stops the workers.
+
+        Raises:
+            RuntimeError: If the FileManager has been shut down.
         """
         with self.lock:
-            if file_path not in self.file_locks:
-                self.file_locks[file_path] = threading.Lock()
-            return self.file_locks[file_path]
+            if self.is_shutdown:
+                raise RuntimeError("Cannot submit operations after shutdown.")
+            self.pending_submissions += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.pending_submissions -= 1
+                if not self.pending_submissions:
+                    self.submissions_finished.notify_all()
 
-    def guard_process(func):
+    def map(
+        self, operations: Iterable[tuple[callable, str, int]], batch_size: int = 1000
+    ) -> Iterator[tuple[tuple[callable, str, int], Future]]:
         """
-        Decorator function to manage the maximum number of parallel tasks.
+        Run file operations in batches, streaming back the results as they finish.
+
+        The operations are read and submitted batch_size at a time with submit_many(),
+        so even a huge iterable only keeps a bounded number of operations in memory.
+
+        Args:
+            operations (Iterable): (operation, file_path, est) tuples
+            batch_size (int): Number of operations grouped and submitted at once
+
+        Yields:
+            tuple: Every operation together with its finished Future, in the order
+                they finish.
+        """
+        operations = iter(operations)
+        pending: list[tuple[tuple[callable, str, int], Future]] = []
+        while True:
+            if chunk := list(islice(operations, batch_size)):
+                pending.extend(zip(chunk, self.submit_many(chunk)))
+            elif pending:
+                wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+            else:
+                return
+            still_pending = []
+            for operation, future in pending:
+                if future.done():
+                    yield operation, future
+                else:
+                    still_pending.append((operation, future))
+            pending = still_pending
+
+    def claim_download(
+        self, file_path: str, deadline: float = None
+    ) -> tuple[Future, SharedDownload | None]:
+        """
+        Returns the Future the caller should wait for the download of a file on.
+
+        It is either an already completed Future with the cached result, or the
+        caller's own Future, resolved when the shared download of the file finishes.
+        Cancelling it or missing the deadline only fails it for this caller, the
+        shared download is skipped only if nobody waits for it when it would start.
+        If no download of the file is running yet, the caller is the owner, who has
+        to run the returned SharedDownload.
 
-        This function ensures that only max_file_process number of threads can
-        run at the same time, keeping the application thread-safe.
+        Args:
+            file_path (str): Path of the file to be downloaded
+            deadline (float): time.monotonic() value the download has to be started
+                by for this caller, no deadline if None
+
+        Returns:
+            tuple[Future, SharedDownload | None]: The caller's Future, and the download
+                to run if the caller owns it.
+        """
+        future = Future()
+        with self.lock:
+            hit, size = self.download_cache.get(file_path)
+            if hit:
+                self.cache_stats["hits"] += 1
+                future.set_result(size)
+                return future, None
+            if file_path in self.downloads_in_flight:
+                self.cache_stats["coalesced"] += 1
+                self.downloads_in_flight[file_path].waiters.append((future, deadline))
+                return future, None
+            self.cache_stats["misses"] += 1
+            shared = self.downloads_in_flight[file_path] = SharedDownload()
+            shared.waiters.append((future, deadline))
+        shared.future.add_done_callback(lambda f: self.finish_download(file_path, shared))
+        return future, shared
+
+    def start_download(self, file_path: str, future: Future) -> bool:
         """
+        Drops the callers who cancelled or missed their deadline from a download about to start.
 
-        def wrapper(self, file_path: str, est: int) -> None:
-            with self.condition:
-                self.logger.debug(
-                    f"Currently running {self.current_processes} processes."
+        The callers past their deadline get DeadlineExceeded on their own Future.
+
+        Args:
+            file_path (str): Path of the file to be downloaded
+            future (Future): The Future of the shared download
+
+        Returns:
+            bool: Whether anyone still waits for the download, it should be skipped otherwise.
+        """
+        now = time.monotonic()
+        with self.lock:
+            shared = self.downloads_in_flight.get(file_path)
+            if shared is None or shared.future is not future:
+                return True
+            expired = []
+            waiting = []
+            for waiter, deadline in shared.waiters:
+                if waiter.cancelled():
+                    continue
+                if deadline is not None and now > deadline:
+                    expired.append(waiter)
+                else:
+                    waiting.append((waiter, deadline))
+            shared.waiters = waiting
+            if not waiting:
+                # Nobody can join the download which is going to be skipped
+                del self.downloads_in_flight[file_path]
+        if expired:
+            self.logger.warning(
+                f"Rejecting {len(expired)} downloads of {file_path}, their deadline has passed."
+            )
+        for waiter in expired:
+            if waiter.set_running_or_notify_cancel():
+                waiter.set_exception(
+                    DeadlineExceeded(f"download_file of {file_path} missed its deadline.")
                 )
-                while self.current_processes >= self.max_file_process:
-                    self.logger.info(
-                        f"Currently running {self.current_processes} processes, thread {threading.get_ident()} is waiting for a free worker..."
-                    )
-                    self.condition.wait()
+        return bool(waiting)
 
-                self.current_processes += 1
-            try:
-                func(self, file_path, est)
-            finally:
-                with self.condition:
-                    self.current_processes -= 1
-                    self.logger.debug(f"Finishing thread {threading.get_ident()}.")
-                    self.condition.notify()
+    def finish_download(self, file_path: str, shared: SharedDownload) -> None:
+        """
+        Passes the result of a finished download to its callers, and lets the next
+        download of the file start.
+
+        The result is cached by save_download, still under the file lock, so a write
+        right after the download can't be overwritten by the stale result.
+        """
+        with self.lock:
+            if self.downloads_in_flight.get(file_path) is shared:
+                del self.downloads_in_flight[file_path]
+            waiters, shared.waiters = shared.waiters, []
+        for waiter, _ in waiters:
+            # A caller may have cancelled its own Future meanwhile
+            if not waiter.set_running_or_notify_cancel():
+                continue
+            if shared.future.cancelled():
+                waiter.set_exception(CancelledError())
+            elif shared.future.exception() is not None:
+                waiter.set_exception(shared.future.exception())
+            else:
+                waiter.set_result(shared.future.result())
+
+    @property
+    def current_limit(self) -> int:
+        """The number of operations currently allowed to run at the same time."""
+        return min(self.limiter.limit, self.max_file_process)
+
+    def metrics(self) -> dict[str, int]:
+        """Returns the current state of the FileManager."""
+        with self.condition:
+            return {
+                "limit": self.current_limit,
+                "running": self.current_processes,
+                "queued": len(self.task_queue),
+                **self.cache_stats,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the worker threads after the already queued operations are done.
+
+        No operation can be submitted after it. The submissions already in progress
+        are queued first, and calling it again only waits for the workers.
+
+        Args:
+            wait (bool): Whether to wait for the workers to finish.
+        """
+        with self.lock:
+            stop_workers = not self.is_shutdown
+            self.is_shutdown = True
+            self.submissions_finished.wait_for(lambda: not self.pending_submissions)
+        if stop_workers:
+            for _ in self.workers:
+                self.task_queue.put(None)
+        if wait:
+            for worker in self.workers:
+                worker.join()
+
+    def acquire_slot(self) -> None:
+        """Wait until fewer than current_limit operations are running, and take a place."""
+        with self.condition:
+            self.logger.debug(f"Currently running {self.current_processes} processes.")
+            while self.current_processes >= self.current_limit:
+                self.logger.info(
+                    f"Currently running {self.current_processes} processes, thread {threading.get_ident()} is waiting for a free worker..."
+                )
+                self.condition.wait()
+
+            self.current_processes += 1
+
+    def release_slot(self) -> None:
+        """Free up a place taken by acquire_slot, letting the waiting threads in."""
+        with self.condition:
+            self.current_processes -= 1
+            self.logger.debug(f"Finishing thread {threading.get_ident()}.")
+            self.condition.notify(max(1, self.current_limit - self.current_processes))
+
+    def report_sample(self, latency: float, dropped: bool) -> None:
+        """Report the latency of a finished operation to the limiter."""
+        with self.condition:
+            old_limit = self.current_limit
+            self.limiter.on_sample(latency, self.current_processes, dropped)
+            if self.current_limit != old_limit:
+                self.logger.info(
+                    f"Concurrency limit changed from {old_limit} to {self.current_limit}."
+                )
+
+    @contextmanager
+    def slot(self):  # -> Generator[None]
+        """Hold a place within the concurrency limit, unless the thread holds one already."""
+        if getattr(self.slot_holders, "held", False):
+            yield
+            return
+        self.acquire_slot()
+        try:
+            yield
+        finally:
+            self.release_slot()
+
+    def guard_process(func):
+        """
+        Decorator function to manage the maximum number of parallel tasks.
+
+        This function ensures that only current_limit number of threads can
+        run at the same time, keeping the application thread-safe. The workers
+        take their place before they take the operation, see worker. The latency of
+        every operation is reported to the limiter, which may change the limit.
+        """
+
+        @wraps(func)
+        def wrapper(self, file_path: str, est: int, *args, **kwargs):
+            with self.slot():
+                start = time.perf_counter()
+                dropped = True
+                try:
+                    result = func(self, file_path, est, *args, **kwargs)
+                    dropped = False
+                    return result
+                finally:
+                    self.report_sample(time.perf_counter() - start, dropped)
 
         return wrapper
 
-    @guard_process
-    def download_file(self, file_path: str, est: int) -> None:
+    def download_file(self, file_path: str, est: int) -> int:
         """
-        Simulate file downloading.
+        Download a file through the storage backend.
 
         This function starts downloading a file, which is simulated by a certain
-        amount of sleep. When the file is downloaded it is saved in self.saved_files
-        for further use. The operation locks the resources only for the duration of the save.
+        amount of sleep with the default backend. When the file is downloaded it is saved
+        in self.saved_files for further use. The operation locks the resources only for
+        the duration of the save.
+        Concurrent downloads of the same file share a single download, and the result
+        is cached for cache_ttl seconds, which later downloads return immediately.
+
+        Args:
+            file_path (str): Path of the file to be downloaded
+            est (int): The number of seconds the simulated download will take
+
+        Returns:
+            int: The size of the downloaded file.
+        """
+        future, shared = self.claim_download(file_path)
+        if shared is not None and shared.future.set_running_or_notify_cancel():
+            try:
+                shared.future.set_result(self.fetch_file(file_path, est))
+            except BaseException as exc:
+                shared.future.set_exception(exc)
+        return future.result()
+
+    @guard_process
+    def fetch_file(self, file_path: str, est: int) -> int:
+        """
+        Actually download a file, without looking it up in the cache, see download_file.
 
         Args:
             file_path (str): Path of the file to be downloaded
             est (int): The number of seconds the simulated download will take
+
+        Returns:
+            int: The size of the downloaded file.
         """
         self.logger.info(
             f"Downloading {file_path}... in thread ID {threading.get_ident()}."
         )
 
-        time.sleep(est)
-        file_lock = self.get_file_lock(file_path)
-        with file_lock:
-            self.logger.info(f"Saving downloaded file {file_path}...")
-            with self.lock:
-                self.saved_files.append(file_path)
+        staged = self.backend.download(file_path, est)
+        with self.file_locks.write(file_path):
+            size = self.save_download(file_path, staged)
             self.logger.debug("Lock released.")
         self.logger.info(
             f"Downloaded {file_path} in {est} seconds within thread ID: {threading.get_ident()}"
         )
+        return size
+
+    def save_download(self, file_path: str, staged: object) -> int:
+        """Save and cache a downloaded file, the caller has to hold the file lock exclusively."""
+        self.logger.info(f"Saving downloaded file {file_path}...")
+        size = self.backend.save(file_path, staged)
+        self.saved_files.add(file_path, size)
+        self.download_cache.put(file_path, size)
+        return size
 
     @guard_process
-    def check_saved_file(self, file_path: str, est: int) -> None:
+    def check_saved_file(self, file_path: str, est: int) -> int | None:
         """
-        Simulate file checking.
+        Check a file through the storage backend.
 
         This function starts checking a file, which is simulated by a certain
-        amount of sleep. It can only carry out the operation if the file exists.
+        amount of sleep with the default backend. It can only carry out the operation if the file exists.
         If it does, the saved file will be checked for est amount of time.
-        The operation locks the resources for the whole duration of the check (sleep).
+        The operation holds the file lock shared with other checks for the whole
+        duration of the check (sleep), so checks of the same file can run in parallel.
 
         Args:
             file_path (str): Path of the file to be checked
             est (int): The number of seconds the simulated check will take
+
+        Returns:
+            int | None: The checksum of the file, or None if the file doesn't exist.
         """
         self.logger.info(
             f"Checking {file_path}... in thread ID {threading.get_ident()}."
         )
 
-        file_lock = self.get_file_lock(file_path)
-        with file_lock:
-            with self.lock:
-                if file_path not in self.saved_files:
-                    self.logger.error(f"File {file_path} not found.")
-                    return
-            time.sleep(est)
-        self.logger.info(
-            f"Checked {file_path} in {est} seconds within thread ID: {threading.get_ident()}"
-        )
+        with self.file_locks.read(file_path):
+            checksum = self.run_check(file_path, est)
+        if checksum is not None:
+            self.logger.info(
+                f"Checked {file_path} in {est} seconds within thread ID: {threading.get_ident()}"
+            )
+        return checksum
+
+    def run_check(self, file_path: str, est: int) -> int | None:
+        """Check a saved file, the caller has to hold the file lock."""
+        if file_path not in self.saved_files:
+            self.logger.error(f"File {file_path} not found.")
+            return None
+        return self.backend.check(file_path, est)
 
     @guard_process
-    def write_file(self, file_path: str, est: int) -> None:
+    def write_file(self, file_path: str, est: int, data: bytes = None) -> int:
         """
-        Simulate writing / editing the file.
+        Write / edit the file through the storage backend.
 
         This function starts "writing" a file, which is simulated by a certain
-        amount of sleep. If the file doesn't exist this function creates it first.
+        amount of sleep with the default backend. If the file doesn't exist this
+        function creates it first.
         After the file is saved, it will be edited for est amount of time.
         The operation locks the resources for the whole duration of the write (sleep).
 
         Args:
-            file_path (str): Path of the file to be checked
-            est (int): The number of seconds the simulated check will take
+            file_path (str): Path of the file to be written
+            est (int): The number of seconds the simulated write will take
+            data (bytes): The data to write, the backend decides what to write if None
+
+        Returns:
+            int: The size of the written file.
         """
         self.logger.info(
             f"Checking if {file_path} exists... in thread ID {threading.get_ident()}."
         )
 
-        file_lock = self.get_file_lock(file_path)
-        with file_lock:
-            with self.lock:
-                if file_path not in self.saved_files:
-                    self.logger.info(
-                        f"File {file_path} not found in saved files.Saving it..."
-                    )
-                    self.saved_files.append(file_path)
-                    self.logger.info(f"Created file {file_path}.")
-
-            time.sleep(est)
+        with self.file_locks.write(file_path):
+            size = self.run_write(file_path, est, data)
         self.logger.info(
             f"Wrote {file_path} in {est} seconds within thread ID: {threading.get_ident()}"
         )
+        return size
+
+    def run_write(self, file_path: str, est: int, data: bytes = None) -> int:
+        """Write a file, the caller has to hold the file lock exclusively."""
+        size = self.backend.write(file_path, est, data)
+        _, created = self.saved_files.upsert(file_path, size)
+        if created:
+            self.logger.info(f"File {file_path} not found in saved files, created it.")
+        self.download_cache.invalidate(file_path)
+        return size
+
+    def run_batch(
+        self, file_path: str, est: int, batch: list[tuple[callable, int, Future]]
+    ) -> None:
+        """
+        Run a batch of operations on the same file back to back.
+
+        The batch only takes a worker and the file lock once. The lock is shared
+        if the batch only consists of checks, exclusive otherwise. The result of
+        every operation is set on its own Future, and the latency of every operation
+        is reported to the limiter on its own, as a whole batch would look like a
+        single slow operation.
+
+        Args:
+            file_path (str): Path of the file to run the operations on
+            est (int): The number of seconds the whole batch will take
+            batch (list): (operation, est, Future) of every operation
+        """
+        self.logger.info(
+            f"Running {len(batch)} operations on {file_path}... in thread ID {threading.get_ident()}."
+        )
+        exclusive = any(operation != self.check_saved_file for operation, _, _ in batch)
+        file_lock = self.file_locks.write if exclusive else self.file_locks.read
+        try:
+            with self.slot(), file_lock(file_path):
+                for operation, op_est, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    if operation == self.fetch_file and not self.start_download(
+                        file_path, future
+                    ):
+                        future.set_exception(
+                            CancelledError(f"Nobody waits for the download of {file_path}.")
+                        )
+                        continue
+                    start = time.perf_counter()
+                    try:
+                        if operation == self.fetch_file:
+                            staged = self.backend.download(file_path, op_est)
+                            result = self.save_download(file_path, staged)
+                        elif operation == self.check_saved_file:
+                            result = self.run_check(file_path, op_est)
+                        else:
+                            result = self.run_write(file_path, op_est)
+                    except Exception as exc:
+                        self.report_sample(time.perf_counter() - start, dropped=True)
+                        future.set_exception(exc)
+                    else:
+                        self.report_sample(time.perf_counter() - start, dropped=False)
+                        future.set_result(result)
+        finally:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(
+                        RuntimeError(f"Batch on {file_path} stopped before running it.")
+                    )
+        self.logger.info(
+            f"Ran {len(batch)} operations on {file_path} within thread ID: {threading.get_ident()}"
+        )
 
 
 # Some example data for simulating file management tasks.
@@ -203,37 +815,36 @@ def main() -> None:
     """
     The main entrypoint of the application.
 
-    It simulates some file operations by creating new threads for a FileManager
-    object to run. It waits for a random amount of seconds after every new thread
-    to realistically simulate the incoming operations.
+    It simulates some file operations by submitting them to a FileManager object,
+    which runs them on its own worker threads. It waits for a random amount of seconds
+    after every submission to realistically simulate the incoming operations.
     """
     logger = getLogger("File manager")
     logger.info("Starting main.")
 
-    file_manager = FileManager(3, logger)
-    file_operations: list[function] = [
-        file_manager.download_file,
-        file_manager.check_saved_file,
-        file_manager.write_file,
-    ]
-    threads: list[threading.Thread] = []
-
-    for _ in range(10):
-        thread = threading.Thread(
-            target=random.choice(file_operations), args=random.choice(download_data)
-        )
-
-        threads.append(thread)
-        logger.debug(f"Creating a new thread: {thread.name}")
-        thread.start()
-
-        # This sleep is here for more closely replicating a real world scenario
-        rand_sleep_amount = random.randint(0, 3)
-        logger.debug(f"Main sleeping for {rand_sleep_amount} seconds.")
-        time.sleep(rand_sleep_amount)
-
-    for thread in threads:
-        thread.join()
+    # Run at most 5 operations at once, backing off when one takes longer than 9 seconds
+    limiter = AIMDLimiter(3, min_limit=1, max_limit=5, latency_threshold=9)
+    with FileManager(5, logger, policy="sjf", limiter=limiter) as file_manager:
+        file_operations: list[callable] = [
+            file_manager.download_file,
+            file_manager.check_saved_file,
+            file_manager.write_file,
+        ]
+        futures: list[Future] = []
+
+        for _ in range(10):
+            operation = random.choice(file_operations)
+            file_path, est = random.choice(download_data)
+            logger.debug(f"Submitting {operation.__name__} for {file_path}.")
+            futures.append(file_manager.submit(operation, file_path, est))
+
+            # This sleep is here for more closely replicating a real world scenario
+            rand_sleep_amount = random.randint(0, 3)
+            logger.debug(f"Main sleeping for {rand_sleep_amount} seconds.")
+            time.sleep(rand_sleep_amount)
+
+        wait(futures)
+        logger.info(f"File manager metrics: {file_manager.metrics()}")
 
     logger.info("Main finished")
 
@@ -0,0 +1,145 @@
+import math
+
+
+class ConcurrencyLimiter:
+    """
+    Base class of the limiters deciding how many operations may run at the same time.
+
+    FileManager reports the latency of every finished operation with on_sample(),
+    and admits new operations only while fewer than limit are running. The
+    limiters are not thread-safe on their own, FileManager calls them while
+    holding its condition lock.
+    """
+
+    # The current concurrency limit
+    limit: int
+    # The limit never goes below min_limit
+    min_limit: int
+    # The limit never goes above max_limit
+    max_limit: int
+
+    def __init__(self, initial_limit: int, min_limit: int, max_limit: int) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = self.clamp(initial_limit)
+
+    def clamp(self, limit: float) -> int:
+        return max(self.min_limit, min(self.max_limit, int(limit)))
+
+    def on_sample(self, latency: float, in_flight: int, dropped: bool = False) -> None:
+        """
+        Update the limit with the result of a finished operation.
+
+        Args:
+            latency (float): The number of seconds the operation took
+            in_flight (int): The number of operations running when it finished
+            dropped (bool): Whether the operation failed
+        """
+
+
+class FixedLimiter(ConcurrencyLimiter):
+    """A limiter that never changes its limit."""
+
+    def __init__(self, limit: int) -> None:
+        super().__init__(limit, limit, limit)
+
+
+class AIMDLimiter(ConcurrencyLimiter):
+    """
+    Additive increase, multiplicative decrease limiter.
+
+    The limit grows by one after every fast operation that finished while the
+    limit was fully used, and it is multiplied by backoff_ratio after every slow
+    (slower than latency_threshold) or failed operation.
+    """
+
+    # Operations slower than this many seconds shrink the limit
+    latency_threshold: float
+    # The limit is multiplied by this after a slow or failed operation
+    backoff_ratio: float
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        latency_threshold: float,
+        backoff_ratio: float = 0.9,
+    ) -> None:
+        super().__init__(initial_limit, min_limit, max_limit)
+        self.latency_threshold = latency_threshold
+        self.backoff_ratio = backoff_ratio
+
+    def on_sample(self, latency: float, in_flight: int, dropped: bool = False) -> None:
+        if dropped or latency > self.latency_threshold:
+            self.limit = self.clamp(self.limit * self.backoff_ratio)
+        elif in_flight >= self.limit:
+            self.limit = self.clamp(self.limit + 1)
+
+
+class GradientLimiter(ConcurrencyLimiter):
+    """
+    Gradient (Vegas style) limiter.
+
+    It compares a short-term and a long-term exponential moving average of the
+    latency. While the short-term latency stays close to the long-term one the
+    system isn't queueing, so the limit grows by about sqrt(limit). When it rises
+    above long-term * tolerance the limit shrinks by the same gradient.
+    """
+
+    # Short-term latency is allowed to exceed the long-term one by this factor
+    tolerance: float
+    # Weight of a new sample in the short-term average
+    short_smoothing: float
+    # Weight of a new sample in the long-term average
+    long_smoothing: float
+    # Weight of the newly computed limit in the limit
+    limit_smoothing: float
+    # The moving averages of the latency, None before the first sample
+    short_latency: float | None
+    long_latency: float | None
+    # The limit as a float, so small changes can add up
+    estimated_limit: float
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        tolerance: float = 1.5,
+        short_smoothing: float = 0.5,
+        long_smoothing: float = 0.05,
+        limit_smoothing: float = 0.2,
+    ) -> None:
+        super().__init__(initial_limit, min_limit, max_limit)
+        self.tolerance = tolerance
+        self.short_smoothing = short_smoothing
+        self.long_smoothing = long_smoothing
+        self.limit_smoothing = limit_smoothing
+        self.short_latency = None
+        self.long_latency = None
+        self.estimated_limit = self.limit
+
+    def on_sample(self, latency: float, in_flight: int, dropped: bool = False) -> None:
+        if dropped:
+            self.estimated_limit = max(self.min_limit, self.estimated_limit / 2)
+            self.limit = self.clamp(self.estimated_limit)
+            return
+        if self.short_latency is None:
+            self.short_latency = self.long_latency = latency
+        self.short_latency += self.short_smoothing * (latency - self.short_latency)
+        self.long_latency += self.long_smoothing * (latency - self.long_latency)
+        if not self.short_latency:
+            return
+
+        gradient = max(
+            0.5, min(1.0, self.tolerance * self.long_latency / self.short_latency)
+        )
+        # Only grow the limit if it is actually used
+        growth = math.sqrt(self.estimated_limit) if in_flight >= self.limit / 2 else 0
+        new_limit = self.estimated_limit * gradient + growth
+        self.estimated_limit += self.limit_smoothing * (new_limit - self.estimated_limit)
+        self.estimated_limit = max(
+            self.min_limit, min(self.max_limit, self.estimated_limit)
+        )
+        self.limit = self.clamp(self.estimated_limit)
@@ -0,0 +1,130 @@
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """
+    A lock that can be held by many readers or a single writer at the same time.
+
+    Waiting writers are preferred over new readers, so a steady stream of
+    readers can't starve the writers.
+    """
+
+    # Condition variable guarding the state of the lock
+    condition: threading.Condition
+    # Number of threads currently holding the lock for reading
+    readers: int
+    # Whether a thread currently holds the lock for writing
+    writer: bool
+    # Number of threads waiting to acquire the lock for writing
+    waiting_writers: int
+
+    def __init__(self) -> None:
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+
+    def acquire_read(self) -> None:
+        with self.condition:
+            while self.writer or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+
+    def release_read(self) -> None:
+        with self.condition:
+            self.readers -= 1
+            if not self.readers:
+                self.condition.notify_all()
+
+    def acquire_write(self) -> None:
+        with self.condition:
+            self.waiting_writers += 1
+            try:
+                while self.writer or self.readers:
+                    self.condition.wait()
+            finally:
+                self.waiting_writers -= 1
+            self.writer = True
+
+    def release_write(self) -> None:
+        with self.condition:
+            self.writer = False
+            self.condition.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class FileLockTable:
+    """
+    A table of per-file ReadWriteLocks, which only keeps the locks in use.
+
+    Every lock is reference counted by the threads holding or waiting for it,
+    and it is evicted from the table as soon as the last one lets it go. This
+    keeps the memory bounded no matter how many distinct paths pass through.
+    """
+
+    # A lock for synchronizing access to the table
+    lock: threading.Lock
+    # Dictionary mapping the paths to their lock and its reference count
+    locks: dict[str, tuple[ReadWriteLock, int]]
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.locks = {}
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.locks)
+
+    def _checkout(self, file_path: str) -> ReadWriteLock:
+        """Returns the lock of a file, creating it if needed, and takes a reference."""
+        with self.lock:
+            file_lock, refs = self.locks.get(file_path, (None, 0))
+            if file_lock is None:
+                file_lock = ReadWriteLock()
+            self.locks[file_path] = (file_lock, refs + 1)
+            return file_lock
+
+    def _checkin(self, file_path: str) -> None:
+        """Drops a reference of a file lock, evicting the lock if it is idle."""
+        with self.lock:
+            file_lock, refs = self.locks[file_path]
+            if refs == 1:
+                del self.locks[file_path]
+            else:
+                self.locks[file_path] = (file_lock, refs - 1)
+
+    @contextmanager
+    def read(self, file_path: str):
+        """Hold the lock of a file shared with other readers."""
+        file_lock = self._checkout(file_path)
+        try:
+            with file_lock.read_locked():
+                yield
+        finally:
+            self._checkin(file_path)
+
+    @contextmanager
+    def write(self, file_path: str):
+        """Hold the lock of a file exclusively."""
+        file_lock = self._checkout(file_path)
+        try:
+            with file_lock.write_locked():
+                yield
+        finally:
+            self._checkin(file_path)
@@ -1,18 +1,17 @@
 import threading
 
-from concurrency.functions import example_task, time_sync
+from concurrency.functions import NUM_OF_TASKS, example_task, time_sync
 
 
 @time_sync
 def main():
     # Creating threads for the example tasks
     threads = [
-        threading.Thread(target=example_task, args=["example"]),
-        threading.Thread(target=example_task, args=["example"]),
-        threading.Thread(target=example_task, args=["example"]),
+        threading.Thread(target=example_task, args=["example"])
+        for _ in range(NUM_OF_TASKS)
     ]
 
-    # Generates 5_000 OS threads, costly
+    # Generates 5_000 OS threads, costly, see fan_out.py for how costly
     # for _ in range(5_000):
     #     threads.append(threading.Thread(target=example_task, args=["example"]))
 
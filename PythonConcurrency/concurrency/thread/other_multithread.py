@@ -1,15 +1,14 @@
 import threading
 
-from concurrency.functions import other_example_task, time_sync
+from concurrency.functions import NUM_OF_TASKS, other_example_task, time_sync
 
 
 @time_sync
 def main():
     # Creating threads for the example tasks
     threads = [
-        threading.Thread(target=other_example_task, args=["other example"]),
-        threading.Thread(target=other_example_task, args=["other example"]),
-        threading.Thread(target=other_example_task, args=["other example"]),
+        threading.Thread(target=other_example_task, args=["other example"])
+        for _ in range(NUM_OF_TASKS)
     ]
 
     # Start the threads
@@ -1,11 +1,10 @@
-from concurrency.functions import other_example_task, time_sync
+from concurrency.functions import NUM_OF_TASKS, other_example_task, time_sync
 
 
 @time_sync
 def main():
-    other_example_task("other example")
-    other_example_task("other example")
-    other_example_task("other example")
+    for _ in range(NUM_OF_TASKS):
+        other_example_task("other example")
 
     print("Main finished ", end="")
 
@@ -0,0 +1,158 @@
+import threading
+import time
+from dataclasses import dataclass, field
+
+from concurrency.functions import time_sync
+
+# Number of distinct paths and threads used by the contention benchmark
+BENCHMARK_PATHS = 1_000_000
+BENCHMARK_THREADS = 64
+# Shard counts compared by the benchmark, 1 shard is a single global lock
+BENCHMARK_SHARDS = [1, 16, 64]
+
+
+@dataclass
+class FileMetadata:
+    """Metadata of a saved file."""
+
+    size: int = 0
+    created_at: float = field(default_factory=time.time)
+    modified_at: float = field(default_factory=time.time)
+    version: int = 1
+
+
+class SavedFileIndex:
+    """
+    A thread-safe index of saved files with constant time membership checks.
+
+    The paths are spread over num_of_shards dictionaries by their hash, each
+    with its own lock, so operations on unrelated paths rarely contend on the
+    same mutex.
+    """
+
+    # Number of shards the paths are spread over
+    num_of_shards: int
+    # Dictionaries mapping the paths to their metadata
+    shards: list[dict[str, FileMetadata]]
+    # One lock per shard
+    shard_locks: list[threading.Lock]
+
+    def __init__(self, num_of_shards: int = 64) -> None:
+        """
+        Initialize the SavedFileIndex.
+
+        Args:
+            num_of_shards (int): Number of independently locked shards.
+        """
+        self.num_of_shards = num_of_shards
+        self.shards = [{} for _ in range(num_of_shards)]
+        self.shard_locks = [threading.Lock() for _ in range(num_of_shards)]
+
+    def _shard(self, file_path: str) -> tuple[dict[str, FileMetadata], threading.Lock]:
+        """Returns the shard of a file path and its lock."""
+        index = hash(file_path) % self.num_of_shards
+        return self.shards[index], self.shard_locks[index]
+
+    def __contains__(self, file_path: str) -> bool:
+        shard, shard_lock = self._shard(file_path)
+        with shard_lock:
+            return file_path in shard
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def get(self, file_path: str) -> FileMetadata | None:
+        """Returns the metadata of a file, or None if it is not saved."""
+        shard, shard_lock = self._shard(file_path)
+        with shard_lock:
+            return shard.get(file_path)
+
+    def add(self, file_path: str, size: int = 0) -> FileMetadata:
+        """
+        Save a file, or bump the version of an already saved one.
+
+        Args:
+            file_path (str): Path of the saved file
+            size (int): Size of the saved file
+        """
+        return self.upsert(file_path, size)[0]
+
+    def upsert(self, file_path: str, size: int = 0) -> tuple[FileMetadata, bool]:
+        """
+        Atomically save a file, or bump the version of an already saved one.
+
+        Args:
+            file_path (str): Path of the saved file
+            size (int): Size of the saved file
+
+        Returns:
+            tuple[FileMetadata, bool]: The metadata of the file, and whether it was created.
+        """
+        shard, shard_lock = self._shard(file_path)
+        with shard_lock:
+            metadata = shard.get(file_path)
+            if metadata is None:
+                metadata = shard[file_path] = FileMetadata(size=size)
+                return metadata, True
+            metadata.size = size
+            metadata.modified_at = time.time()
+            metadata.version += 1
+            return metadata, False
+
+    def remove(self, file_path: str) -> FileMetadata | None:
+        """Remove a file from the index, returning its metadata if it was saved."""
+        shard, shard_lock = self._shard(file_path)
+        with shard_lock:
+            return shard.pop(file_path, None)
+
+
+def run_contention_benchmark(num_of_shards: int) -> float:
+    """
+    Add, then look up BENCHMARK_PATHS paths from BENCHMARK_THREADS threads at once.
+
+    Returns:
+        float: The elapsed time in seconds.
+    """
+    index = SavedFileIndex(num_of_shards)
+    paths = [f"benchmark/path/{i}" for i in range(BENCHMARK_PATHS)]
+    barrier = threading.Barrier(BENCHMARK_THREADS + 1)
+
+    def work(thread_paths: list[str]) -> None:
+        barrier.wait()
+        for path in thread_paths:
+            index.add(path)
+        for path in thread_paths:
+            assert path in index
+
+    threads = [
+        threading.Thread(target=work, args=(paths[i::BENCHMARK_THREADS],))
+        for i in range(BENCHMARK_THREADS)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+@time_sync
+def main() -> None:
+    """
+    The main entrypoint of the saved file index benchmark.
+
+    It compares the time BENCHMARK_THREADS threads need to save and check
+    BENCHMARK_PATHS paths, with different number of shards.
+    """
+    print(f"{BENCHMARK_PATHS} paths, {BENCHMARK_THREADS} threads")
+    print(f"{'shards':>8} {'time (s)':>10} {'ops/s':>12}")
+    for num_of_shards in BENCHMARK_SHARDS:
+        elapsed = run_contention_benchmark(num_of_shards)
+        print(f"{num_of_shards:>8} {elapsed:10.2f} {2 * BENCHMARK_PATHS / elapsed:12.0f}")
+
+    print("Main finished ", end="")
+
+
+if __name__ == "__main__":
+    main()
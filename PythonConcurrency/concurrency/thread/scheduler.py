@@ -0,0 +1,137 @@
+import heapq
+import itertools
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+# The scheduling policies supported by TaskScheduler
+POLICIES = ("fifo", "priority", "deadline", "sjf")
+
+
+class DeadlineExceeded(Exception):
+    """Raised on the Future of an operation that couldn't be started before its deadline."""
+
+
+@dataclass
+class ScheduledTask:
+    """A file operation waiting in a TaskScheduler."""
+
+    future: Future
+    operation: callable
+    file_path: str
+    est: int
+    # Tasks with a higher priority are started first by the priority policy
+    priority: int = 0
+    # time.monotonic() value the task has to be started by, None means no deadline
+    deadline: float | None = None
+    submitted_at: float = field(default_factory=time.monotonic)
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+
+class TaskScheduler:
+    """
+    A bounded queue of file operations, handing them out by a scheduling policy.
+
+    The supported policies are:
+        fifo: in the order of submission
+        priority: highest priority first
+        deadline: earliest deadline first, tasks without a deadline go last
+        sjf: shortest estimated job (est) first
+
+    Ties are always broken by the order of submission. None can be put into
+    the queue to stop a worker, it is only handed out after every task.
+    """
+
+    # The scheduling policy
+    policy: str
+    # Maximum number of pending tasks, put() blocks when it is reached
+    maxsize: int
+    # Heap of (sort key, task) pairs
+    heap: list[tuple[tuple, ScheduledTask | None]]
+    # A lock for synchronizing access to the heap
+    mutex: threading.Lock
+    # Condition variable for waiting for a task
+    not_empty: threading.Condition
+    # Condition variable for waiting for a free place
+    not_full: threading.Condition
+    # Increasing counter for breaking ties in the order of submission
+    counter: itertools.count
+
+    def __init__(self, maxsize: int, policy: str = "fifo") -> None:
+        """
+        Initialize the TaskScheduler.
+
+        Args:
+            maxsize (int): Maximum number of pending tasks
+            policy (str): One of POLICIES
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy {policy}, use one of {POLICIES}.")
+        self.policy = policy
+        self.maxsize = maxsize
+        self.heap = []
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.not_full = threading.Condition(self.mutex)
+        self.counter = itertools.count()
+
+    def __len__(self) -> int:
+        with self.mutex:
+            return len(self.heap)
+
+    def sort_key(self, task: ScheduledTask | None) -> tuple:
+        """Returns the key the heap is ordered by, smallest is handed out first."""
+        seq = next(self.counter)
+        if task is None:
+            return (1, seq)
+        if self.policy == "priority":
+            return (0, -task.priority, seq)
+        if self.policy == "deadline":
+            deadline = task.deadline if task.deadline is not None else math.inf
+            return (0, deadline, -task.priority, seq)
+        if self.policy == "sjf":
+            return (0, task.est, seq)
+        return (0, seq)
+
+    def put(self, task: ScheduledTask | None, timeout: float = None) -> None:
+        """
+        Add a task, blocking while the queue is full.
+
+        Raises:
+            queue.Full: If no place was freed up in the queue within timeout.
+        """
+        with self.not_full:
+            if not self.not_full.wait_for(
+                lambda: len(self.heap) < self.maxsize, timeout
+            ):
+                raise queue.Full
+            heapq.heappush(self.heap, (self.sort_key(task), task))
+            self.not_empty.notify()
+
+    def wait(self) -> None:
+        """Block until the queue isn't empty, without removing anything."""
+        with self.not_empty:
+            self.not_empty.wait_for(lambda: self.heap)
+
+    def get(self, block: bool = True) -> ScheduledTask | None:
+        """
+        Remove and return the next task.
+
+        Args:
+            block (bool): Whether to wait while the queue is empty.
+
+        Raises:
+            queue.Empty: If the queue is empty and block is False.
+        """
+        with self.not_empty:
+            if not block and not self.heap:
+                raise queue.Empty
+            self.not_empty.wait_for(lambda: self.heap)
+            _, task = heapq.heappop(self.heap)
+            self.not_full.notify()
+            return task
@@ -1,11 +1,10 @@
-from concurrency.functions import example_task, time_sync
+from concurrency.functions import NUM_OF_TASKS, example_task, time_sync
 
 
 @time_sync
 def main():
-    example_task("example")
-    example_task("example")
-    example_task("example")
+    for _ in range(NUM_OF_TASKS):
+        example_task("example")
 
     print("Main finished ", end="")
 
@@ -0,0 +1,265 @@
+import mmap
+import os
+import tempfile
+import threading
+import time
+import zlib
+from logging import getLogger
+
+from concurrency.functions import time_sync
+
+# Size of the buffers used for chunked reads and writes
+CHUNK_SIZE = 1 << 20
+# Files at least this large are checked through mmap instead of chunked reads
+MMAP_THRESHOLD = 1 << 22
+
+
+class StorageBackend:
+    """
+    Base class of the storage backends FileManager runs its operations on.
+
+    A download is split into two steps, so FileManager only has to lock the file
+    while the downloaded data is saved: download() fetches the file into a staging
+    area and returns a handle for it, then save() moves it into place.
+    """
+
+    def download(self, file_path: str, est: int) -> object:
+        """Fetch a file into the staging area, returning a handle for save()."""
+        raise NotImplementedError
+
+    def save(self, file_path: str, staged: object) -> int:
+        """Move a downloaded file into place, returning its size."""
+        raise NotImplementedError
+
+    def check(self, file_path: str, est: int) -> int:
+        """Read a saved file through, returning its checksum."""
+        raise NotImplementedError
+
+    def write(self, file_path: str, est: int, data: bytes = None) -> int:
+        """Write a file, returning its size."""
+        raise NotImplementedError
+
+
+class SimulatedBackend(StorageBackend):
+    """The original backend, where every operation is simulated by sleeping est seconds."""
+
+    def download(self, file_path: str, est: int) -> None:
+        time.sleep(est)
+
+    def save(self, file_path: str, staged: None) -> int:
+        return 0
+
+    def check(self, file_path: str, est: int) -> int:
+        time.sleep(est)
+        return 0
+
+    def write(self, file_path: str, est: int, data: bytes = None) -> int:
+        time.sleep(est)
+        return len(data) if data else 0
+
+
+class LocalDiskBackend(StorageBackend):
+    """
+    A backend doing real I/O on the local disk.
+
+    Files are "downloaded" from source_root into root. Copies are done in the
+    kernel with copy_file_range or sendfile where the platform supports it. Large
+    files are checked through mmap, everything else is read and written in chunks
+    through a reusable per-thread buffer, without intermediate copies.
+    """
+
+    # Directory the files are saved into
+    root: str
+    # Directory the files are downloaded from
+    source_root: str
+    # Size of the reusable buffers
+    chunk_size: int
+    # Files at least this large are checked through mmap
+    mmap_threshold: int
+    # Holds the reusable buffer of every thread
+    local: threading.local
+    # A read-only chunk of zeros, written when there is no data to write
+    zeros: memoryview
+
+    def __init__(
+        self,
+        root: str,
+        source_root: str,
+        chunk_size: int = CHUNK_SIZE,
+        mmap_threshold: int = MMAP_THRESHOLD,
+    ) -> None:
+        """
+        Initialize the LocalDiskBackend.
+
+        Args:
+            root (str): Directory the files are saved into
+            source_root (str): Directory the files are downloaded from
+            chunk_size (int): Size of the reusable read / write buffers
+            mmap_threshold (int): Files at least this large are checked through mmap
+        """
+        self.root = os.path.abspath(root)
+        self.source_root = os.path.abspath(source_root)
+        self.chunk_size = chunk_size
+        self.mmap_threshold = mmap_threshold
+        self.local = threading.local()
+        self.zeros = memoryview(bytes(chunk_size))
+
+    @property
+    def buffer(self) -> memoryview:
+        """The reusable buffer of the calling thread."""
+        if not hasattr(self.local, "buffer"):
+            self.local.buffer = memoryview(bytearray(self.chunk_size))
+        return self.local.buffer
+
+    @staticmethod
+    def resolve(root: str, file_path: str) -> str:
+        """Returns the absolute path of file_path inside root."""
+        path = os.path.normpath(os.path.join(root, file_path))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"File path {file_path} points outside of {root}.")
+        return path
+
+    def copy(self, src_fd: int, dst_fd: int, size: int) -> None:
+        """
+        Copy size bytes between two file descriptors, in the kernel if possible.
+
+        Every method continues where the previous one stopped, copy_file_range and
+        sendfile may stop early, e.g. between some filesystems.
+
+        Raises:
+            OSError: If the source ended before size bytes were copied.
+        """
+        copied = 0
+        try:
+            while copied < size:
+                if not (count := os.copy_file_range(src_fd, dst_fd, size - copied)):
+                    break
+                copied += count
+        except (AttributeError, OSError):
+            # copy_file_range is missing or not supported between these files
+            pass
+        try:
+            while copied < size:
+                if not (count := os.sendfile(dst_fd, src_fd, copied, size - copied)):
+                    break
+                copied += count
+        except (AttributeError, OSError):
+            pass
+        if copied < size:
+            os.lseek(src_fd, copied, os.SEEK_SET)
+            os.lseek(dst_fd, copied, os.SEEK_SET)
+            buffer = self.buffer
+            while copied < size and (read := os.readv(src_fd, [buffer])):
+                self.write_all(dst_fd, buffer[:read])
+                copied += read
+        if copied < size:
+            raise OSError(f"Copied only {copied} of {size} bytes, the source got truncated.")
+
+    def write_all(self, fd: int, view: memoryview) -> None:
+        """Write the whole view in chunks, handling partial writes."""
+        while view:
+            written = os.write(fd, view[: self.chunk_size])
+            view = view[written:]
+
+    def download(self, file_path: str, est: int) -> str:
+        """Copy a file from source_root into a temporary file next to its destination."""
+        src = self.resolve(self.source_root, file_path)
+        dst = self.resolve(self.root, file_path)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        dst_fd, staged = tempfile.mkstemp(dir=os.path.dirname(dst), suffix=".part")
+        try:
+            with open(src, "rb") as src_file:
+                self.copy(src_file.fileno(), dst_fd, os.fstat(src_file.fileno()).st_size)
+        except BaseException:
+            os.unlink(staged)
+            raise
+        finally:
+            os.close(dst_fd)
+        return staged
+
+    def save(self, file_path: str, staged: str) -> int:
+        dst = self.resolve(self.root, file_path)
+        os.replace(staged, dst)
+        return os.stat(dst).st_size
+
+    def check(self, file_path: str, est: int) -> int:
+        """Compute the CRC32 of a saved file."""
+        checksum = 0
+        with open(self.resolve(self.root, file_path), "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size >= self.mmap_threshold:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return zlib.crc32(mapped)
+            buffer = self.buffer
+            while read := file.readinto(buffer):
+                checksum = zlib.crc32(buffer[:read], checksum)
+        return checksum
+
+    def write(self, file_path: str, est: int, data: bytes = None) -> int:
+        """
+        Write data into a saved file, replacing its content.
+
+        If there is no data, est chunks of zeros are written instead. The data is
+        written into a temporary file next to the saved one, which then replaces it,
+        so a failed write leaves the saved file intact.
+        """
+        path = self.resolve(self.root, file_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, staged = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            try:
+                os.fchmod(fd, 0o644)
+                if data is not None:
+                    view = memoryview(data).cast("B")
+                    self.write_all(fd, view)
+                    size = len(view)
+                else:
+                    for _ in range(int(est)):
+                        self.write_all(fd, self.zeros)
+                    size = int(est) * self.chunk_size
+            finally:
+                os.close(fd)
+            os.replace(staged, path)
+        except BaseException:
+            os.unlink(staged)
+            raise
+        return size
+
+
+@time_sync
+def main() -> None:
+    """
+    The main entrypoint of the storage backend demo.
+
+    It creates a few source files in a temporary directory, then runs real
+    downloads, checks and writes on them with a FileManager.
+    """
+    from concurrency.thread.file_manager import FileManager, download_data
+
+    logger = getLogger("File manager storage")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source_root = os.path.join(tmp_dir, "source")
+        for file_path, est in download_data:
+            path = os.path.join(source_root, file_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(os.urandom(est * CHUNK_SIZE))
+
+        backend = LocalDiskBackend(os.path.join(tmp_dir, "saved"), source_root)
+        with FileManager(3, logger, backend=backend) as file_manager:
+            for file_path, est in download_data:
+                file_manager.submit(file_manager.download_file, file_path, est).result()
+            checks = [
+                file_manager.submit(file_manager.check_saved_file, file_path, est)
+                for file_path, est in download_data
+            ]
+            for (file_path, _), check in zip(download_data, checks):
+                print(f"{file_path}: crc32 {check.result():08x}")
+            file_manager.submit(file_manager.write_file, "local/new.txt", 2).result()
+            print(f"Saved files: {len(file_manager.saved_files)}")
+
+    print("Main finished ", end="")
+
+
+if __name__ == "__main__":
+    main()
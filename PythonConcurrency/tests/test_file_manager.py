@@ -0,0 +1,62 @@
+import queue
+import threading
+import time
+from logging import getLogger
+
+import pytest
+
+from concurrency.thread.file_manager import FileManager
+from concurrency.thread.scheduler import DeadlineExceeded
+
+
+def test_submit_many_releases_unqueued_downloads():
+    """A group that couldn't be queued doesn't leave its download in flight."""
+    release = threading.Event()
+    with FileManager(1, getLogger("test"), max_queue_size=1) as file_manager:
+        try:
+            # Keep the only worker busy, and fill up the queue
+            busy = file_manager.submit(lambda file_path, est: release.wait(), "busy", 0)
+            while len(file_manager.task_queue):
+                time.sleep(0.01)
+            queued = file_manager.submit(file_manager.write_file, "queued", 0)
+
+            with pytest.raises(queue.Full):
+                file_manager.submit_many(
+                    [
+                        (file_manager.download_file, "A", 0),
+                        (file_manager.download_file, "B", 0),
+                    ],
+                    timeout=0.1,
+                )
+            assert file_manager.downloads_in_flight == {}
+        finally:
+            release.set()
+
+        busy.result(timeout=5)
+        queued.result(timeout=5)
+        download = file_manager.submit(file_manager.download_file, "B", 0)
+        assert download.result(timeout=5) == 0
+
+
+def test_coalesced_downloads_fail_per_caller():
+    """A caller's deadline or cancel doesn't fail the download it shares with others."""
+    release = threading.Event()
+    with FileManager(1, getLogger("test")) as file_manager:
+        try:
+            busy = file_manager.submit(lambda file_path, est: release.wait(), "busy", 0)
+            while len(file_manager.task_queue):
+                time.sleep(0.01)
+            late = file_manager.submit(file_manager.download_file, "A", 0, deadline=0)
+            waiting = file_manager.submit(file_manager.download_file, "A", 0)
+            cancelled = file_manager.submit(file_manager.download_file, "B", 0)
+            other = file_manager.submit(file_manager.download_file, "B", 0)
+            assert cancelled is not other
+            assert cancelled.cancel()
+        finally:
+            release.set()
+
+        busy.result(timeout=5)
+        with pytest.raises(DeadlineExceeded):
+            late.result(timeout=5)
+        assert waiting.result(timeout=5) == 0
+        assert other.result(timeout=5) == 0
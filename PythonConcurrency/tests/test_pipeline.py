@@ -0,0 +1,32 @@
+import pytest
+
+from concurrency.multiprocess.pipeline import Pipeline, Stage
+
+
+def fail_on_five(item: int) -> int:
+    if item == 5:
+        raise ValueError("five")
+    return item
+
+
+def consume(results) -> None:
+    for _ in results:
+        pass
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_failing_stage_raises_on_join(ordered):
+    """A stage that raises fails join() instead of leaving it waiting forever."""
+    pipeline = Pipeline(
+        [Stage(fail_on_five, replicas=2)],
+        sink=consume,
+        start_method="fork",
+        capacity=2,
+        ordered=ordered,
+        window=4,
+    )
+    pipeline.start()
+    pipeline.feed(range(100))
+    with pytest.raises(RuntimeError, match="fail_on_five failed"):
+        pipeline.join()
+    assert [s.error is not None for s in pipeline.replica_stats].count(True) == 1